@@ -3,6 +3,7 @@ from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from easyrpc.core import MethodContainer, rpc
 from easyrpc.exceptions import APIFault
 from easyrpc.validation.types import String, Dict
+from easyrpc.cache import CachePolicy
 
 class APIBase(MethodContainer):
     request = None #This is to provide a hook for the analysic in my IDE...
@@ -23,7 +24,7 @@ class customdata(APIBase):
     def userData(self, user_ref, _returns=Dict):
         return QUERY_OF_DATA
 
-    @rpc(String, String, _returns=Dict)
+    @rpc(String, String, _returns=Dict, _cache=CachePolicy(ttl=60, vary_on=('request.user.id',)))
     def websiteData(self, website_slug, user_site_slug):
         return QUEYR_OF_WEBSITE_DATA
 
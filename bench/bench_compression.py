@@ -0,0 +1,54 @@
+"""
+Bytes saved by response compression against the CPU it costs, per
+encoding and level, for list responses of repetitive rows.
+
+    python -m easyrpc.bench.bench_compression
+"""
+import json, timeit
+from ..core import RequestHandler, MethodContainer, rpc
+from ..compression import ResponseCompression
+from ..validation.types import Integer
+
+CASES = [('gzip', 1), ('gzip', 6), ('gzip', 9), ('deflate', 6), ('br', 4), ('br', 11), ('zstd', 3)]
+
+
+class Bench(MethodContainer):
+    @rpc(Integer)
+    def rows(self, count):
+        return [ {'id': i, 'name': u'Row %d' % i, 'active': i % 2 == 0, 'score': i * 1.5, 'tags': [u'a', u'b']}
+                 for i in xrange(count) ]
+
+
+def per_request(handler, body, environ, number):
+    #Milliseconds, best of three.
+    return min(timeit.repeat(lambda: handler.handle_request(body, 'POST', environ), number=number, repeat=3)) / number * 1e3
+
+
+def response_size(response):
+    return len(response[0] if isinstance(response, tuple) else response)
+
+
+def main():
+    plain = RequestHandler([Bench])
+    print '%8s %10s %6s %12s %8s %12s %10s' % ('rows', 'encoding', 'level', 'bytes', 'saved', 'ms/request', 'extra ms')
+    for count, number in ((100, 200), (5000, 10)):
+        body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'Bench.rows', 'params': [count]})
+        environ = {'QUERY_STRING': ''}
+        size = response_size(plain.handle_request(body, 'POST', environ))
+        base = per_request(plain, body, environ, number)
+        print '%8d %10s %6s %12d %8s %12.2f %10s' % (count, 'identity', '-', size, '-', base, '-')
+        for encoding, level in CASES:
+            compression = ResponseCompression(level=level, encodings=(encoding,))
+            if not compression.encodings:
+                print '%8d %10s %6d %12s' % (count, encoding, level, 'not installed')
+                continue
+            handler = RequestHandler([Bench], compression=compression)
+            environ = {'QUERY_STRING': '', 'HTTP_ACCEPT_ENCODING': encoding}
+            compressed = response_size(handler.handle_request(body, 'POST', environ))
+            took = per_request(handler, body, environ, number)
+            print '%8d %10s %6d %12d %7.1f%% %12.2f %10.2f' % (count, encoding, level, compressed,
+                                                              100.0 * (size - compressed) / size, took, took - base)
+
+
+if __name__ == '__main__':
+    main()
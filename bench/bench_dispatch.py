@@ -0,0 +1,100 @@
+"""
+Times request dispatch through `RequestHandler.handle_request`, with 
+metrics off and on, the cost of the disabled metrics checks alone, 
+`invoke` against the per call path it replaced, and batches where every 
+call fails validation with and without verbose errors.
+
+    python -m easyrpc.bench.bench_dispatch
+"""
+import json, timeit
+from ..core import RequestHandler, MethodContainer, rpc
+from ..interface import MethodInvocation
+from ..metrics import Metrics
+from ..validation.types import Integer, String
+
+GUARDS = 10 #`metrics is not None` checks a one invocation request passes: 8, 9 when it fails.
+
+
+class Bench(MethodContainer):
+    @rpc(Integer, String(required=False))
+    def echo(self, number, text=None):
+        return {'number': number, 'text': text}
+
+
+def payload(size):
+    calls = [ {'jsonrpc': '2.0', 'id': i, 'method': 'Bench.echo', 'params': [i, u'x']} for i in range(size) ]
+    return json.dumps(calls[0] if size == 1 else calls)
+
+
+def failing_payload(size):
+    #Strings where Integers are expected, every call raises InvalidParameters.
+    return json.dumps([ {'jsonrpc': '2.0', 'id': i, 'method': 'Bench.echo', 'params': [u'x']} for i in range(size) ])
+
+
+def per_call(function, number):
+    #Microseconds, best of three.
+    return min(timeit.repeat(function, number=number, repeat=3)) / number * 1e6
+
+
+def uncompiled_invoke(handler, invocation):
+    #The per call path before invocation plans: a container, a bound method and validation from the argspec.
+    method_descriptor = handler.lookup_method(invocation.method_name)
+    method = getattr(method_descriptor._class(), method_descriptor.name)
+    args = method_descriptor.argspec.args
+    args = args[1:] if args[0] == 'self' else args
+    parameters = dict(zip(method_descriptor.argspec.args[1:], invocation.parameters))
+    cleaned = {}
+    for arg, param in zip(args, method_descriptor.params):
+        cleaned[arg] = param.validate(arg, parameters[arg]) if arg in parameters else param.validate(arg)
+    return handler.translator.resolve(method(**cleaned))
+
+
+def guards(metrics=None):
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+    if metrics is not None: pass
+
+def no_guards(metrics=None):
+    pass
+
+
+def main(number=2000):
+    environ = {'QUERY_STRING': ''}
+    handlers = [ ('metrics off', RequestHandler([Bench])), ('metrics on', RequestHandler([Bench], metrics=Metrics())) ]
+    print '%-12s %8s %14s %16s' % ('handler', 'batch', 'us/request', 'us/invocation')
+    for size in (1, 50):
+        body = payload(size)
+        for name, handler in handlers:
+            took = per_call(lambda: handler.handle_request(body, 'POST', environ), number // size)
+            print '%-12s %8d %14.2f %16.2f' % (name, size, took, took / size)
+
+    body = failing_payload(50)
+    print
+    print '%-12s %8s %14s %16s' % ('errors', 'batch', 'us/request', 'us/invocation')
+    for verbose in (False, True):
+        handler = RequestHandler([Bench], verbose_errors=verbose)
+        took = per_call(lambda: handler.handle_request(body, 'POST', environ), number // 50)
+        print '%-12s %8d %14.2f %16.2f' % ('verbose' if verbose else 'terse', 50, took, took / 50)
+
+    handler = RequestHandler([Bench])
+    print
+    print '%-12s %14s' % ('invoke', 'us/call')
+    for name, invoke in (('uncompiled', lambda invocation: uncompiled_invoke(handler, invocation)), 
+                         ('compiled', handler.invoke)):
+        took = per_call(lambda: invoke(MethodInvocation('Bench.echo', [1, u'x'], 1)), number * 10)
+        print '%-12s %14.2f' % (name, took)
+
+    overhead = per_call(guards, number * 100) - per_call(no_guards, number * 100)
+    print
+    print "disabled metrics checks: %.3f us per one invocation request (%d checks, an upper bound)" % (max(overhead, 0), GUARDS)
+
+
+if __name__ == '__main__':
+    main()
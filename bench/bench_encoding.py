@@ -0,0 +1,36 @@
+"""
+Compares the JSON encoding backends, compact and pretty printed, on a 
+batch of plain rows and on the same rows with a datetime column.
+
+    python -m easyrpc.bench.bench_encoding
+"""
+import datetime, json, timeit
+from ..interface.jsonrpc import JSONBackend, datetime_json_default
+
+ROWS = [ {'id': i, 'name': u'row %d' % i, 'price': i * 1.5, 'active': i % 2 == 0, 'tags': [u'a', u'b']}
+         for i in range(1000) ]
+DATED_ROWS = [ dict(row, created=datetime.datetime(2012, 1, 1, 12, 0)) for row in ROWS ]
+
+
+def backends():
+    yield 'json', JSONBackend(json)
+    try:
+        import simplejson
+    except ImportError:
+        pass
+    else:
+        yield 'simplejson', JSONBackend(simplejson)
+
+
+def main(number=200):
+    print '%-12s %-8s %12s %12s' % ('backend', 'output', 'plain ms', 'dated ms')
+    for name, backend in backends():
+        for pretty in (False, True):
+            timings = [ min(timeit.repeat(lambda: backend.dumps(rows, datetime_json_default, pretty),
+                                          number=number, repeat=3)) / number * 1000
+                        for rows in (ROWS, DATED_ROWS) ]
+            print '%-12s %-8s %12.3f %12.3f' % (name, 'pretty' if pretty else 'compact', timings[0], timings[1])
+
+
+if __name__ == '__main__':
+    main()
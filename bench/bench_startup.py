@@ -0,0 +1,68 @@
+"""
+Times worker startup: importing `core` in a fresh interpreter, declaring
+containers with a few hundred `@rpc` methods, and `RequestHandler([...])`
+the first time (descriptors are built) and afterwards (they are cached
+per class).
+
+    python -m easyrpc.bench.bench_startup
+"""
+import os, sys, subprocess, timeit
+from ..core import RequestHandler, MethodContainer, rpc
+from ..validation.types import Integer, String, List
+
+PACKAGE = __package__.split('.')[0]
+HEAVY = ('simplejson', 'multiprocessing', 'sqlite3', 'django')
+
+IMPORT_SCRIPT = """
+import sys, timeit
+started = timeit.default_timer()
+import %s.core
+print timeit.default_timer() - started
+print ' '.join([ m for m in %r if m in sys.modules ])
+""" % (PACKAGE, HEAVY)
+
+
+def import_time(repeat=5):
+    #Seconds for `import core` in a fresh interpreter, best of `repeat`, and the heavy modules it loaded.
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    best, loaded = None, None
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT], env=env)
+        seconds, loaded = output.split('\n', 1)
+        best = min(best, float(seconds)) if best is not None else float(seconds)
+    return best, loaded.split()
+
+
+def method(i):
+    def call(self, number, text=None, numbers=None):
+        return number
+    call.__name__ = 'call%d' % i
+    return rpc(Integer, String(required=False), List(Integer(), required=False))(call)
+
+
+def containers(count, per_container=10):
+    #Fresh classes every time, so their descriptors aren't cached yet.
+    return [ type('Service%d' % c, (MethodContainer,),
+                  dict([ ('call%d' % i, method(i)) for i in range(per_container) ]))
+             for c in range(count // per_container) ]
+
+
+def main():
+    seconds, loaded = import_time()
+    print 'import core: %.1f ms, heavy modules loaded: %s' % (seconds * 1e3, ', '.join(loaded) or 'none')
+    print
+    print '%10s %14s %16s %16s' % ('methods', 'declare ms', 'first handler ms', 'next handler ms')
+    for count in (10, 100, 300, 1000):
+        declare = min(timeit.repeat(lambda: containers(count), number=1, repeat=3))
+        first = []
+        for i in range(3):
+            services = containers(count)
+            started = timeit.default_timer()
+            RequestHandler(services)
+            first.append(timeit.default_timer() - started)
+        after = min(timeit.repeat(lambda: RequestHandler(services), number=1, repeat=3))
+        print '%10d %14.2f %16.2f %16.2f' % (count, declare * 1e3, min(first) * 1e3, after * 1e3)
+
+
+if __name__ == '__main__':
+    main()
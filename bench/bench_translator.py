@@ -0,0 +1,35 @@
+"""
+Shows transformer lookups cost the same however many translators the 
+process has built before, each translator owns its registry.
+
+    python -m easyrpc.bench.bench_translator
+"""
+import decimal, timeit
+from ..translation.plain import PlainTranslator
+
+VALUES = [1, u'text', 1.5, None, decimal.Decimal('2.5'), {'a': 1}, [1, 2], (3, 4)]
+
+
+def per_lookup(translator, number=20000):
+    #Microseconds per `get_transformer`, best of three.
+    def lookups():
+        for value in VALUES:
+            translator.get_transformer(value)
+    return min(timeit.repeat(lookups, number=number, repeat=3)) / (number * len(VALUES)) * 1e6
+
+
+def main():
+    print '%14s %16s %18s %14s' % ('translators', 'us/lookup', 'us/construction', 'registry size')
+    built = 0
+    for total in (1, 10, 100, 1000, 10000):
+        started = timeit.default_timer()
+        for i in xrange(total - built):
+            translator = PlainTranslator()
+        constructed = (timeit.default_timer() - started) / (total - built) * 1e6
+        built = total
+        size = len(translator.default_transformers) + len(translator.transformers)
+        print '%14d %16.3f %18.2f %14d' % (total, per_lookup(translator), constructed, size)
+
+
+if __name__ == '__main__':
+    main()
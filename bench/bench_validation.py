@@ -0,0 +1,58 @@
+"""
+Compares compiled schemas with the checks one would write by hand, for a
+10k element `List(Integer())` and a list of small records.
+
+    python -m easyrpc.bench.bench_validation
+"""
+import timeit
+from ..exceptions import InvalidParameters
+from ..validation.types import Integer, String, List, Dict
+
+SIZE = 10000
+NUMBERS = range(SIZE)
+RECORDS = [ {'id': i, 'name': u'x'} for i in range(SIZE) ]
+
+
+def by_hand_numbers(keyword, value):
+    if value is None:
+        return value
+    if not isinstance(value, list):
+        raise InvalidParameters('Argument "%s" must be a valid List/Sequence.' % keyword)
+    for index, item in enumerate(value):
+        if item is not None and not isinstance(item, int):
+            raise InvalidParameters('Argument "%s[%d]" must be a valid Integer.' % (keyword, index))
+    return value
+
+
+def by_hand_records(keyword, value):
+    if not isinstance(value, list):
+        raise InvalidParameters('Argument "%s" must be a valid List/Sequence.' % keyword)
+    for index, item in enumerate(value):
+        if not isinstance(item, dict):
+            raise InvalidParameters('Argument "%s[%d]" must be a valid Hash/Dictionary.' % (keyword, index))
+        if not isinstance(item.get('id'), int):
+            raise InvalidParameters('Argument "%s[%d].id" must be a valid Integer.' % (keyword, index))
+        if 'name' in item and item['name'] is not None and not isinstance(item['name'], basestring):
+            raise InvalidParameters('Argument "%s[%d].name" must be a valid String.' % (keyword, index))
+    return value
+
+
+def per_check(check, value, number=20):
+    #Milliseconds per check of the whole list, best of three.
+    return min(timeit.repeat(lambda: check('values', value), number=number, repeat=3)) / number * 1e3
+
+
+def main():
+    cases = [
+        ('List(Integer())', List(Integer()).compile(), by_hand_numbers, NUMBERS),
+        ('List(Dict(...))', List(Dict({'id': Integer(), 'name': String(required=False)})).compile(), by_hand_records, RECORDS),
+    ]
+    print '%d elements' % SIZE
+    print '%18s %14s %14s %8s' % ('schema', 'compiled ms', 'by hand ms', 'ratio')
+    for name, compiled, by_hand, value in cases:
+        compiled_ms, by_hand_ms = per_check(compiled, value), per_check(by_hand, value)
+        print '%18s %14.3f %14.3f %8.2f' % (name, compiled_ms, by_hand_ms, compiled_ms / by_hand_ms)
+
+
+if __name__ == '__main__':
+    main()
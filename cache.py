@@ -0,0 +1,154 @@
+"""
+Result caching for RPC methods.
+
+Attach a policy with `@rpc(..., _cache=CachePolicy(ttl=60))`, the handler
+looks the result up after the parameters are validated and stores the
+translated result, so hits skip both the method and the translator.
+"""
+import time, threading, os, sqlite3, cPickle
+from collections import OrderedDict
+from .utils import canonical_key, MISSING
+
+
+class CachePolicy(object):
+    """
+    Parameters::
+     - `ttl`: Seconds a result stays valid.
+     - `max_entries`: Size of the default `LRUCache`, ignored when `backend` is given.
+     - `key`: Callable taking the validated parameters, returns what identifies
+       the call. Defaults to all of the parameters.
+     - `vary_on`: Dotted paths into the handler keywords (ie. 'request.user.id')
+       that are added to the key.
+     - `backend`: Anything with `get(key)`, `set(key, value, ttl)` and `stats()`.
+    """
+    def __init__(self, ttl=300, max_entries=1000, key=None, vary_on=(), backend=None):
+        self.ttl = ttl
+        self.key = key
+        self.vary_on = tuple(vary_on)
+        self.backend = backend if backend is not None else LRUCache(max_entries)
+
+    def make_key(self, method_name, params, kw):
+        parts = self.key(params) if self.key is not None else params
+        vary = [ self.resolve_path(path, kw) for path in self.vary_on ]
+        return canonical_key([method_name, parts, vary])
+
+    def resolve_path(self, path, kw):
+        name, _, rest = path.partition('.')
+        value = kw.get(name)
+        for attr in rest.split('.') if rest else ():
+            value = getattr(value, attr, None)
+        return value
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+
+class LRUCache(object):
+    """
+    In process cache, evicts the least recently used entry past `max_entries`.
+    """
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return MISSING
+            self._entries[key] = entry #Move to the most recently used end.
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+class SQLiteCache(object):
+    """
+    Cache in a local SQLite file, so the worker processes of one box
+    share results. Values are pickled, hit and miss counts are per process.
+
+    Rows are counted every `prune_every` writes of a process and pruned to 
+    `max_entries` when there are more, so the file can briefly hold a few 
+    extra. Hits only record their time when the recorded one is over 
+    `touch_interval` seconds old, eviction order is that coarse.
+    """
+    def __init__(self, path, max_entries=10000, prune_every=100, touch_interval=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.touch_interval = touch_interval
+        self.hits = self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        #Connections can't cross threads or forks.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS rpc_cache '
+                               '(key TEXT PRIMARY KEY, expires REAL, accessed REAL, value BLOB)')
+            connection.execute('CREATE INDEX IF NOT EXISTS rpc_cache_expires ON rpc_cache (expires)')
+            connection.execute('CREATE INDEX IF NOT EXISTS rpc_cache_accessed ON rpc_cache (accessed)')
+            self._local.connection, self._local.pid = connection, pid
+        return self._local.connection
+
+    def get(self, key):
+        now = time.time()
+        row = self.connection.execute('SELECT value, accessed FROM rpc_cache WHERE key = ? AND expires >= ?',
+                                      (key, now)).fetchone()
+        if row is None:
+            self.misses += 1
+            return MISSING
+        if row[1] < now - self.touch_interval:
+            self.connection.execute('UPDATE rpc_cache SET accessed = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        return cPickle.loads(str(row[0]))
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        value = sqlite3.Binary(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+        self.connection.execute('INSERT OR REPLACE INTO rpc_cache VALUES (?, ?, ?, ?)', (key, now + ttl, now, value))
+        self._writes += 1
+        if self._writes >= self.prune_every:
+            self._writes = 0
+            self.prune(now)
+
+    def prune(self, now=None):
+        """
+        Drops expired rows, then the least recently used ones past `max_entries`.
+        """
+        connection = self.connection
+        if connection.execute('SELECT COUNT(*) FROM rpc_cache').fetchone()[0] <= self.max_entries:
+            return
+        connection.execute('DELETE FROM rpc_cache WHERE expires < ?', (now or time.time(),))
+        connection.execute('DELETE FROM rpc_cache WHERE key IN (SELECT key FROM rpc_cache '
+                           'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def clear(self):
+        self.connection.execute('DELETE FROM rpc_cache')
+
+    def stats(self):
+        entries = self.connection.execute('SELECT COUNT(*) FROM rpc_cache').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
@@ -0,0 +1,148 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+Pass `RequestHandler(..., compression=ResponseCompression())`. gzip and
+deflate are always there, br and zstd when the brotli or zstandard
+packages are installed.
+"""
+import zlib
+from itertools import chain
+
+
+class BrotliCompressor(object):
+    def __init__(self, level):
+        import brotli
+        self.compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+def brotli_compressor(level):
+    return BrotliCompressor(level)
+
+def zstd_compressor(level):
+    import zstandard
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+def gzip_compressor(level):
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+def deflate_compressor(level):
+    return zlib.compressobj(level)
+
+#Content-Encoding -> (module it needs, compressor factory taking a level)
+CODECS = {
+    'br': ('brotli', brotli_compressor),
+    'zstd': ('zstandard', zstd_compressor),
+    'gzip': (None, gzip_compressor),
+    'deflate': (None, deflate_compressor),
+}
+
+
+def parse_accept_encoding(header):
+    """
+    Returns content coding -> q value.
+    """
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class ResponseCompression(object):
+    """
+    Parameters::
+     - `min_size`: Responses smaller than this many bytes are sent as they are.
+     - `level`: The default level, methods can set their own with
+       `@rpc(_compress_level=N)` (0 turns it off). A batch uses the lowest
+       level its methods ask for.
+     - `encodings`: Preference between the encodings a client accepts
+       equally, the ones that aren't installed are dropped.
+    """
+    def __init__(self, min_size=1024, level=6, encodings=('br', 'zstd', 'gzip', 'deflate')):
+        self.min_size = min_size
+        self.level = level
+        self.encodings = tuple([ e for e in encodings if self.available(CODECS[e][0]) ])
+
+    def available(self, module):
+        if module is None:
+            return True
+        try:
+            __import__(module)
+        except ImportError:
+            return False
+        return True
+
+    def negotiate(self, accept_encoding):
+        """
+        The encoding to use for this Accept-Encoding header, or None.
+        """
+        accepted = parse_accept_encoding(accept_encoding or '')
+        best, best_q = None, 0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, accepted.get('*', 0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compressor(self, headers, accept_encoding, level):
+        level = self.level if level is None else level
+        encoding = self.negotiate(accept_encoding) if level > 0 else None
+        headers['Vary'] = 'Accept-Encoding'
+        if encoding is None:
+            return None
+        headers['Content-Encoding'] = encoding
+        return CODECS[encoding][1](level)
+
+    def compress(self, content, headers, accept_encoding, level=None):
+        """
+        Returns `content` compressed, with the headers set, if it's large
+        enough and the client accepts one of the encodings.
+        """
+        if len(content) < self.min_size:
+            return content
+        compressor = self.compressor(headers, accept_encoding, level)
+        if compressor is None:
+            return content
+        return compressor.compress(content) + compressor.flush()
+
+    def compress_stream(self, chunks, headers, accept_encoding, level=None):
+        """
+        The same for an iterable of chunks. The headers go out first, so
+        chunks are read up to `min_size` to decide.
+        """
+        chunks, buffered, size = iter(chunks), [], 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= self.min_size:
+                break
+        else:
+            return buffered #All of it, and it's too small.
+
+        compressor = self.compressor(headers, accept_encoding, level)
+        if compressor is None:
+            return chain(buffered, chunks)
+        return self._iter_compress(chain(buffered, chunks), compressor)
+
+    def _iter_compress(self, chunks, compressor):
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
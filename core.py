@@ -3,15 +3,30 @@ This is the main file responsible for handing the request off to the
 proper handlers and invoking the class and method specified.
 """
 
-import inspect
+import inspect, threading, os, types, time, heapq
+from collections import deque
+from itertools import count, islice, chain
 from functools import wraps
-from exceptions import EAPIException, MethodNotFound, BadInvocation, APIFault
-from validation.types import validate_parameters
+from exceptions import EAPIException, MethodNotFound, BadInvocation, APIFault, InvocationTimeout, InvocationNotStarted
+from validation.types import compile_parameters
+from .interface import MethodInvocation
 from .interface.jsonrpc import JSONRPCInterface
 from .translation.plain import PlainTranslator
+from .utils import canonical_key, MISSING
 
 #The container is loaded at each request, this avoids the penalty of inspection.
-_public_methods_cache = {}
+_public_methods_cache = {} #Container class -> method descriptors
+
+
+def materialize(obj):
+    """
+    Returns `obj` with the generators in it, at any depth, read into lists.
+    """
+    if isinstance(obj, (types.GeneratorType, list, tuple)):
+        return [ materialize(v) for v in obj ]
+    if isinstance(obj, dict):
+        return dict([ (k, materialize(v)) for k, v in obj.iteritems() ])
+    return obj
 
 
 class MethodContainer(object):
@@ -21,16 +36,21 @@ class MethodContainer(object):
     def __init__(self, **kw):
         self.__dict__.update(kw)
 
-    def build_public_methods(self):
-        """Returns a list of method descriptors for this object"""
-        public_methods = []
-
-        for func_name in dir(self):
-            func = getattr(self, func_name)
-            if callable(func) and hasattr(func, '_is_rpc'):
-                descriptor = func(_method_descriptor=True, _class=self.__class__)
-                public_methods.append(descriptor)
-
+    @classmethod
+    def build_public_methods(cls):
+        """
+        Returns a list of method descriptors for this class. They are built 
+        once per class from the class dictionaries, without instantiating it.
+        """
+        public_methods = _public_methods_cache.get(cls)
+        if public_methods is None:
+            attributes = {}
+            for klass in reversed(inspect.getmro(cls)):
+                attributes.update(vars(klass))
+            public_methods = _public_methods_cache[cls] = [
+                MethodDescriptor(cls, *func._rpc_spec) for func_name, func in sorted(attributes.items())
+                if callable(func) and hasattr(func, '_is_rpc')
+            ]
         return public_methods
 
 
@@ -38,7 +58,8 @@ class MethodDescriptor(object):
     """
     This is a container class for all methods contained inside of MethodContainer.
     """
-    def __init__(self, _class, name, public_name, doc, params, argspec, faults, returns):
+    def __init__(self, _class, name, public_name, doc, params, argspec, faults, returns, concurrent=True, cache=None,
+                 dedupe=True, compress_level=None, columnar=False, timeout=None):
         self._class = _class
         self.name = name
         self.public_name = public_name
@@ -47,6 +68,24 @@ class MethodDescriptor(object):
         self.argspec = argspec
         self.faults = faults
         self.returns = returns
+        self.concurrent = concurrent
+        self.cache = cache
+        self.dedupe = dedupe
+        self.compress_level = compress_level
+        self.columnar = columnar
+        self.timeout = timeout
+
+    def compile(self):
+        """
+        Work out once what every call needs: the names positional parameters 
+        map to, the parameter validator and the plain function to call with 
+        a container.
+        """
+        self.arg_names = tuple(self.argspec.args[1:])
+        self.validate = compile_parameters(self.argspec, self.params)
+        method = getattr(self._class, self.name)
+        self.function = getattr(method, '__func__', method)
+        return self
         
 
 class InvocationResult(object):
@@ -54,19 +93,235 @@ class InvocationResult(object):
         self.result = result
 
     
+class PooledCall(object):
+    """
+    One invocation of a batch on the pool. With a timeout the thread runs 
+    a copy that is only copied back when it finishes in time, so the 
+    response can't change after it has been given up on.
+    """
+    def __init__(self, invocation, timeout):
+        self.invocation = invocation
+        self.timeout = timeout
+        if timeout is None:
+            self.target = invocation
+        else:
+            self.target = MethodInvocation(invocation.method_name, invocation.parameters, invocation.id,
+                                           **invocation.additional)
+        self.queued = time.time()
+        self.started = None
+        self.submitted = self.given_up = False
+
+    def deadline(self):
+        #Waiting for a slot or a thread counts from when it was queued, running from when it started.
+        if self.timeout is None:
+            return None
+        return (self.queued if self.started is None else self.started) + self.timeout
+
+
+class PooledBatch(object):
+    """
+    Runs the invocations of one batch on the pool, at most `limit` at once. 
+    Calls that run past their timeout are given up on, and so are calls 
+    that are still waiting for a slot or a thread when their timeout has 
+    passed since they were queued (a thread that gets to them later skips 
+    them). A call that was given up on keeps its slot until its thread is 
+    done with it.
+    """
+    def __init__(self, pool, limit, run):
+        self.pool = pool
+        self.limit = limit
+        self.run = run
+        self.waiting = deque() #Not handed to the pool yet.
+        self.queue_deadlines = [] #Heap of (deadline, order, call) of the calls above that have a timeout.
+        self.inflight = set() #Handed to the pool, neither done nor given up on.
+        self.busy = 0 #Handed to the pool and not done yet, given up on or not.
+        self.given_up = []
+        self.order = count()
+        self.condition = threading.Condition()
+
+    def add(self, invocation, timeout):
+        """
+        Queues a call, it's handed to the pool right away if there is a slot.
+        """
+        call = PooledCall(invocation, timeout)
+        with self.condition:
+            self.waiting.append(call)
+            if timeout is not None:
+                heapq.heappush(self.queue_deadlines, (call.deadline(), next(self.order), call))
+            self.submit()
+
+    def join(self):
+        """
+        Runs the calls and waits until each one is done or given up on. 
+        Returns the calls that were given up on, `started` tells whether 
+        they ran out of time or never started.
+        """
+        with self.condition:
+            while True:
+                now = time.time()
+                self.expire(now)
+                self.submit()
+                if not self.waiting and not self.inflight:
+                    return self.given_up
+                deadline = self.next_deadline()
+                self.condition.wait(max(deadline - now, 0) if deadline is not None else None)
+
+    def submit(self):
+        #Called holding the condition.
+        while self.waiting and self.busy < self.limit:
+            call = self.waiting.popleft()
+            call.submitted = True
+            self.busy += 1
+            self.inflight.add(call)
+            self.pool.apply_async(self.call, (call,))
+
+    def call(self, call):
+        #On the pool thread.
+        with self.condition:
+            skip = call.given_up
+            if not skip:
+                call.started = time.time()
+        try:
+            if not skip:
+                self.run(call.target)
+        finally:
+            with self.condition:
+                self.busy -= 1
+                if call in self.inflight:
+                    self.inflight.discard(call)
+                    if call.target is not call.invocation:
+                        call.invocation.__dict__.update(call.target.__dict__)
+                self.condition.notify_all()
+
+    def expire(self, now):
+        #Called holding the condition.
+        for call in list(self.inflight):
+            deadline = call.deadline()
+            if deadline is not None and deadline <= now:
+                self.give_up(call)
+        expired = False
+        while self.queue_deadlines and self.queue_deadlines[0][0] <= now:
+            call = heapq.heappop(self.queue_deadlines)[-1]
+            if not call.submitted:
+                self.give_up(call)
+                expired = True
+        if expired:
+            self.waiting = deque([ call for call in self.waiting if not call.given_up ])
+
+    def give_up(self, call):
+        call.given_up = True
+        self.inflight.discard(call)
+        self.given_up.append(call)
+
+    def next_deadline(self):
+        while self.queue_deadlines and self.queue_deadlines[0][-1].submitted:
+            heapq.heappop(self.queue_deadlines)
+        deadlines = [ call.deadline() for call in self.inflight if call.timeout is not None ]
+        if self.queue_deadlines:
+            deadlines.append(self.queue_deadlines[0][0])
+        return min(deadlines) if deadlines else None
+
+
 class RequestHandler(object):
-    def __init__(self, services, interface=JSONRPCInterface, translator=PlainTranslator):
+    """
+    With `stream=True` responses are returned as an iterable of encoded 
+    chunks (see `BaseInterface.response_stream`) instead of one string. 
+    Translators with a `stream_chunk_size` (ie. `StreamingDjangoTranslator`) 
+    require it.
+
+    With `concurrency=N` the invocations of a batch run on a pool of N 
+    threads, at most `batch_concurrency` (default N) at once per batch. 
+    Methods flagged with `@rpc(_concurrent=False)` always run on the 
+    request thread once the others are done. Each thread uses its own 
+    database connections, so pooled invocations do not share the request's 
+    transaction.
+
+    With `translate_on_encode=True` results are not translated up front, the 
+    interface consults the translator while encoding instead (see `RPCRequest`) 
+    so no plain copy of the result is built. Only interfaces that can do this 
+    (`encodes_with_translator`, ie. `JSONRPCInterface`) are accepted.
+
+    `verbose_errors` adds tracebacks to error responses. When it isn't given 
+    `default_verbose_errors` decides, tracebacks are only extracted when on.
+
+    Identical invocations (same method and parameters) in one batch run once 
+    and share the result. Methods with side effects opt out with 
+    `@rpc(_dedupe=False)`, `deduplicate=False` turns it off entirely.
+
+    `metrics` takes a `metrics.Metrics` to time every phase of a request.
+
+    `profiler` takes a `profiling.Profiler` to run a sample of the method
+    calls under cProfile and log slow ones.
+
+    `interfaces` are alternatives to `interface` (ie. `MessagePackRPCInterface`), 
+    picked per request by `select_interface` from the Content-Type or Accept 
+    header. Responses from them carry their own Content-Type header.
+
+    `compression` takes a `compression.ResponseCompression` to compress 
+    responses for clients that accept it, streamed ones included.
+
+    Results of methods flagged with `@rpc(_columnar=True)`, or of every 
+    method when the request asks for it (a `columnar` query parameter), are 
+    translated with `resolve_columnar`: lists of rows become 
+    {"columns": [...], "rows": [[...], ...]}.
+
+    `invocation_timeout` is how many seconds a pooled invocation may run 
+    before the batch stops waiting for it and reports an `InvocationTimeout`, 
+    methods can set their own with `@rpc(_timeout=N)`. One that waited that 
+    long for a free thread without starting gets `InvocationNotStarted`. 
+    Only invocations on the pool can time out, so it needs `concurrency` 
+    (1 will do, anything that can time out goes to the pool). The thread 
+    is not interrupted, it stays busy until the method returns.
+    """
+    def __init__(self, services, interface=JSONRPCInterface, translator=PlainTranslator, stream=False,
+                 concurrency=None, batch_concurrency=None, translate_on_encode=False, verbose_errors=None,
+                 deduplicate=True, metrics=None, profiler=None, interfaces=(), compression=None,
+                 invocation_timeout=None):
         self.interface = interface() if callable(interface) else interface
+        self.interfaces = tuple([ i() if callable(i) else i for i in interfaces ])
         self.translator = translator() if callable(translator) else translator
+        self.verbose_errors = self.default_verbose_errors() if verbose_errors is None else verbose_errors
+        self.stream = stream
+        self.translate_on_encode = translate_on_encode
+        if getattr(self.translator, 'stream_chunk_size', None) and not stream:
+            raise ValueError('%r translates to generators, it needs stream=True.' % self.translator)
+        if translate_on_encode:
+            for i in (self.interface,) + self.interfaces:
+                if not i.encodes_with_translator:
+                    raise ValueError('translate_on_encode is not supported by %r.' % i)
+        self.deduplicate = deduplicate
+        self.metrics = metrics
+        self.profiler = profiler
+        self.compression = compression
+        self.concurrency = concurrency
+        self.batch_concurrency = batch_concurrency or concurrency
+        self.invocation_timeout = invocation_timeout
+        if invocation_timeout is not None and not concurrency:
+            raise ValueError('invocation_timeout needs concurrency, only pooled invocations can time out.')
+        self._pool = None
+        self._pool_lock = threading.Lock()
         self.build_invocation_map(services)
 
     def build_invocation_map(self, services):
         self.invocation_lookup = {} #Storage for finding the right method later.
         
         for service in services:
-            methods = service().build_public_methods()
+            methods = service.build_public_methods()
             for method in methods:
-                self.invocation_lookup[self.create_invocation_name(method)] = method       
+                self.invocation_lookup[self.create_invocation_name(method)] = method.compile()
+
+    def default_verbose_errors(self):
+        """
+        Hook for the environment default, reads EASYRPC_VERBOSE_ERRORS.
+        """
+        return os.environ.get('EASYRPC_VERBOSE_ERRORS', '').lower() in ('1', 'true', 'yes', 'on')
+
+    def cache_stats(self):
+        """
+        Returns invocation name -> backend stats for methods with a cache policy.
+        """
+        return dict([ (name, method.cache.backend.stats()) 
+                      for name, method in self.invocation_lookup.iteritems() if method.cache is not None ])
 
     def create_invocation_name(self, method):
         """
@@ -86,38 +341,305 @@ class RequestHandler(object):
         interface with the... interface, to receive invocation objects 
         and exceptions and call the appropriate methods to generate output
         """
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.time()
+
+        interface = self.select_interface(environ)
+
         #It's possible to have an error in the parsing stage, before the invocations can be created.
         try:
-            rpc_request = self.interface.parse(request_body, method, environ, **kw)
+            rpc_request = interface.parse(request_body, method, environ, **kw)
         except Exception as e:
             print 'uh oh'
             pass #:TODO:
             raise
-        
-        for invocation in rpc_request.unresolved():
-            try:
-                method_descriptor = self.lookup_method(invocation.method_name)
 
-                method_container = method_descriptor._class(**kw)
-                actual_method = getattr(method_container, method_descriptor.name)
+        if metrics is not None:
+            self.observe_phase('parse', None, started)
+            metrics.observe_bytes('request', len(request_body or ''))
+        
+        if self.translate_on_encode:
+            rpc_request.translator = self.translator
 
-                #If the args are list based instead of name based, convert to name based.
-                if isinstance(invocation.parameters, (list, tuple)):
-                    invocation.parameters = dict(zip(method_descriptor.argspec.args[1:], invocation.parameters))
+        #Invocations run as the batch is decoded, see `RPCRequest`.
+        invocations, duplicates = self.pending_invocations(rpc_request), []
+        if self.deduplicate:
+            invocations = self.skip_duplicates(invocations, duplicates)
 
-                #Validate passed in parameters against defined parameters.
-                clean_parameters = validate_parameters(method_descriptor.argspec, method_descriptor.params, invocation.parameters)
+        pooled = False
+        if self.concurrency:
+            #The pool is for batches, the first two tell. Without more than one thread it's for 
+            #timeouts, which any invocation can have.
+            head = list(islice(invocations, 2 if self.concurrency > 1 else None))
+            pooled, invocations = self.use_pool(head), chain(head, invocations)
 
-                result = actual_method(**clean_parameters)
-                result = self.translator.resolve(result)
+        if pooled:
+            self.run_concurrently(invocations, **kw)
+        else:
+            for invocation in invocations:
+                self.run_invocation(invocation, **kw)
+        if metrics is not None:
+            metrics.observe_batch(len(rpc_request.invocations))
 
-                invocation.result(result)
-            except EAPIException as e:
-                invocation.error(e)
-            except Exception as e:
-                invocation.error(EAPIException(str(e), orig=e))
+        for invocation, original in duplicates:
+            if original.is_error:
+                invocation.error(original.value)
+            elif isinstance(original.value, types.GeneratorType):
+                self.run_invocation(invocation, **kw) #Generators can only be consumed once.
+            else:
+                invocation.result(original.value)
         
-        return self.interface.response(rpc_request, verbose_errors=True)
+        if self.stream:
+            content, headers = interface.response_stream(rpc_request, verbose_errors=self.verbose_errors)
+            if metrics is not None:
+                content = self.count_streamed(content)
+            if interface is not self.interface:
+                headers.setdefault('Content-Type', interface.content_type)
+            if self.compression is not None:
+                content = self.compression.compress_stream(content, headers, environ.get('HTTP_ACCEPT_ENCODING'),
+                                                           self.compression_level(rpc_request))
+            return content, headers
+
+        if metrics is not None:
+            started = time.time()
+        content = interface.response(rpc_request, verbose_errors=self.verbose_errors)
+        if metrics is not None:
+            self.observe_phase('encode', None, started)
+            metrics.observe_bytes('response', len(content[0] if isinstance(content, (tuple, list)) else content))
+        if interface is not self.interface or self.compression is not None:
+            content, headers = content if isinstance(content, (tuple, list)) else (content, {})
+            if interface is not self.interface:
+                #The callers default the Content-Type to the main interface's.
+                headers.setdefault('Content-Type', interface.content_type)
+            if self.compression is not None:
+                content = self.compression.compress(content, headers, environ.get('HTTP_ACCEPT_ENCODING'),
+                                                    self.compression_level(rpc_request))
+            return content, headers
+        return content
+
+    def compression_level(self, rpc_request):
+        """
+        The lowest `_compress_level` of the methods in the request, or None.
+        """
+        levels = [ self.invocation_lookup[i.method_name].compress_level for i in rpc_request.invocations 
+                   if i.method_name in self.invocation_lookup ]
+        levels = [ level for level in levels if level is not None ]
+        return min(levels) if levels else None
+
+    def select_interface(self, environ):
+        """
+        The interface whose media type the request's Content-Type names, or 
+        failing that its Accept header. Defaults to `interface`.
+        """
+        if not self.interfaces:
+            return self.interface
+        content_type, accept = environ.get('CONTENT_TYPE') or '', environ.get('HTTP_ACCEPT') or ''
+        for header in (content_type, accept):
+            for interface in (self.interface,) + self.interfaces:
+                if any([ media_type in header for media_type in self.media_types(interface) ]):
+                    return interface
+        return self.interface
+
+    def media_types(self, interface):
+        return getattr(interface, 'media_types', (interface.content_type,))
+
+    def observe_phase(self, phase, method_name, started):
+        now = time.time()
+        self.metrics.observe(phase, method_name, now - started)
+        return now
+
+    def count_streamed(self, content):
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        self.metrics.observe_bytes('response', size)
+
+    def pending_invocations(self, rpc_request):
+        """
+        The invocations of the request that still have to run.
+        """
+        columnar = rpc_request.params.get('columnar')
+        for invocation in rpc_request:
+            if columnar:
+                invocation.additional['columnar'] = True
+            if invocation.resolved is False:
+                yield invocation
+
+    def skip_duplicates(self, invocations, duplicates):
+        """
+        Yields the invocations to run, (duplicate, original) pairs are added 
+        to `duplicates`. Nothing is keyed until there is a second invocation.
+        """
+        seen, first = None, None
+        for invocation in invocations:
+            if first is None:
+                first = invocation
+                yield invocation
+                continue
+            if seen is None:
+                seen = {}
+                self.duplicate_key(first, seen)
+            original = self.duplicate_key(invocation, seen)
+            if original is None:
+                yield invocation
+            else:
+                duplicates.append((invocation, original))
+
+    def duplicate_key(self, invocation, seen):
+        """
+        Records `invocation` in `seen` unless an identical one is there, 
+        which is returned.
+        """
+        method_descriptor = self.invocation_lookup.get(invocation.method_name)
+        if method_descriptor is None or not method_descriptor.dedupe:
+            return None
+        parameters = invocation.parameters
+        if isinstance(parameters, (list, tuple)):
+            parameters = dict(zip(method_descriptor.arg_names, parameters))
+        key = (invocation.method_name, canonical_key(parameters))
+        if key in seen:
+            return seen[key]
+        seen[key] = invocation
+        return None
+
+    def run_invocation(self, invocation, **kw):
+        """
+        Invoke and record the result or error on the invocation.
+        """
+        try:
+            invocation.result(self.invoke(invocation, **kw))
+        except EAPIException as e:
+            self.record_error(invocation, e)
+        except Exception as e:
+            self.record_error(invocation, EAPIException(str(e), orig=e))
+
+    def run_pooled(self, invocation, **kw):
+        """
+        `run_invocation` on a pool thread, followed by `release_thread`.
+        """
+        try:
+            self.run_invocation(invocation, **kw)
+        finally:
+            self.release_thread()
+
+    def release_thread(self):
+        """
+        Hook to let go of what a pool thread holds on to after an invocation.
+        """
+        pass
+
+    def record_error(self, invocation, error):
+        """
+        Called from inside the except block handling `error`.
+        """
+        if self.verbose_errors:
+            error.capture_trace()
+        if self.metrics is not None:
+            self.metrics.count_error(invocation.method_name, error)
+        invocation.error(error)
+
+    def run_concurrently(self, invocations, **kw):
+        """
+        Run a batch on the thread pool, each invocation is handed over as 
+        it's decoded. Results land on their own invocation so the response 
+        keeps the request order.
+        """
+        serial = []
+        batch = PooledBatch(self.get_pool(), self.batch_concurrency, lambda invocation: self.run_pooled(invocation, **kw))
+        for invocation in invocations:
+            method_descriptor = self.invocation_lookup.get(invocation.method_name)
+            if method_descriptor is None or not method_descriptor.concurrent:
+                serial.append(invocation)
+                continue
+            batch.add(invocation, self.timeout_for(invocation))
+
+        for call in batch.join():
+            name = call.invocation.method_name
+            if call.started is None:
+                error = InvocationNotStarted('The method "%s" could not start within %s seconds, every thread was busy.'
+                                             % (name, call.timeout))
+            else:
+                error = InvocationTimeout('The method "%s" did not finish within %s seconds.' % (name, call.timeout))
+            self.record_error(call.invocation, error)
+        for invocation in serial:
+            self.run_invocation(invocation, **kw)
+
+    def use_pool(self, invocations):
+        """
+        Batches run on the pool when `concurrency` is over 1, and anything 
+        that can time out runs there with any `concurrency`.
+        """
+        if not self.concurrency or not invocations:
+            return False
+        if self.concurrency > 1 and len(invocations) > 1:
+            return True
+        return any([ self.timeout_for(invocation) is not None for invocation in invocations ])
+
+    def timeout_for(self, invocation):
+        method_descriptor = self.invocation_lookup.get(invocation.method_name)
+        if method_descriptor is not None and method_descriptor.timeout is not None:
+            return method_descriptor.timeout
+        return self.invocation_timeout
+
+    def get_pool(self):
+        #Created on first use so forking servers don't inherit dead threads.
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    from multiprocessing.pool import ThreadPool #Slow to import, most handlers never need it.
+                    self._pool = ThreadPool(self.concurrency)
+        return self._pool
+
+    def invoke(self, invocation, **kw):
+        """
+        Call the method for a single invocation and return the translated 
+        result. Exceptions are left for `run_invocation` to record.
+        """
+        method_descriptor, metrics = self.lookup_method(invocation.method_name), self.metrics
+        if metrics is not None:
+            started = time.time()
+
+        #If the args are list based instead of name based, convert to name based.
+        if isinstance(invocation.parameters, (list, tuple)):
+            invocation.parameters = dict(zip(method_descriptor.arg_names, invocation.parameters))
+
+        #Validate passed in parameters against defined parameters.
+        clean_parameters = method_descriptor.validate(invocation.parameters)
+        if metrics is not None:
+            started = self.observe_phase('validate', invocation.method_name, started)
+
+        columnar = method_descriptor.columnar or invocation.additional.get('columnar', False)
+        cache = method_descriptor.cache
+        if cache is not None:
+            #Cached results are stored translated, so hits skip the translator too.
+            key = cache.make_key(invocation.method_name + (' columnar' if columnar else ''), clean_parameters, kw)
+            result = cache.get(key)
+            if result is not MISSING:
+                return result
+
+        if self.profiler is not None:
+            result = self.profiler.call(invocation.method_name, clean_parameters,
+                                        method_descriptor.function, method_descriptor._class(**kw))
+        else:
+            result = method_descriptor.function(method_descriptor._class(**kw), **clean_parameters)
+        if metrics is not None:
+            started = self.observe_phase('method', invocation.method_name, started)
+        if self.translate_on_encode and cache is None and not columnar:
+            return result
+
+        if columnar:
+            result = self.translator.resolve_columnar(result)
+        else:
+            result = self.translator.resolve(result)
+        if metrics is not None:
+            self.observe_phase('translate', invocation.method_name, started)
+        if cache is not None:
+            #Generators (ie. from StreamingDjangoTranslator) can only be read once.
+            result = materialize(result)
+            cache.set(key, result)
+        return result
         
 
 def rpc(*params, **kparams):
@@ -133,30 +655,39 @@ def rpc(*params, **kparams):
     only be used on member methods of an instance of ServiceBase.
     """
     def explain(f):
+        descparams = []
+        for param in params:
+            if callable(param):
+                param = param()
+            if not hasattr(param, 'validate'):
+                raise TypeError('RPC Descriptors must have a validate method.')
+            descparams.append(param)
+
+        #Everything but the class, which isn't known yet, is worked out once here.
+        spec = (
+            f.func_name,
+            kparams.get('_public_name', f.func_name),
+            getattr(f, '__doc__'),
+            descparams,
+            inspect.getargspec(f),
+            kparams.get('_faults', []),
+            kparams.get('_returns', 'Unknown'),
+            kparams.get('_concurrent', True),
+            kparams.get('_cache'),
+            kparams.get('_dedupe', True),
+            kparams.get('_compress_level'),
+            kparams.get('_columnar', False),
+            kparams.get('_timeout'),
+        )
+
         @wraps(f)
         def explain_method(*args, **kwargs):
             if '_method_descriptor' not in kwargs :
                 return f(*args, **kwargs)
-            descparams = []
-            for param in params:
-                if callable(param):
-                    param = param()
-                if not hasattr(param, 'validate'):
-                    raise TypeError('RPC Descriptors must have a validate method.')
-                descparams.append(param)
-            
-            return MethodDescriptor(
-                kwargs.get('_class'),
-                f.func_name,
-                kparams.get('_public_name', f.func_name),
-                getattr(f, '__doc__'),
-                descparams,
-                inspect.getargspec(f),
-                kparams.get('_faults', []),
-                kparams.get('_returns', 'Unknown'),
-            )
+            return MethodDescriptor(kwargs.get('_class'), *spec)
 
         explain_method._is_rpc = True
+        explain_method._rpc_spec = spec
         return explain_method
 
     return explain
\ No newline at end of file
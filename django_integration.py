@@ -1,25 +1,82 @@
 """
 Django wrapper to integrate into the request object.
 """
-import inspect, re
+import inspect, re, logging, threading
+from itertools import islice
+from operator import attrgetter, methodcaller, itemgetter
 from core import RequestHandler
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.shortcuts import _get_queryset
 from core import MethodContainer
 from exceptions import APIFault
 from translation.plain import PlainTranslator
+from validation.types import NoValue
+from utils import canonical_key, MISSING
 from django.http import HttpResponse
-from django.db.models.query import QuerySet, ValuesListQuerySet, ValuesQuerySet
-from django.db.models import Model
+try:
+    from django.http import StreamingHttpResponse
+except ImportError: #Before Django 1.5 HttpResponse accepts iterators.
+    StreamingHttpResponse = HttpResponse
+from django.db.models.query import QuerySet, ValuesListQuerySet, ValuesQuerySet, prefetch_related_objects
+from django.db.models import Model, Q
+from django.core import signing
+from django.db import connections
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CURSOR_SALT = 'easyrpc.cursor'
 
 
 class DjangoContainer(MethodContainer):
+    """
+    `_page_models` pages with cursors, `page_size` is the default number of 
+    rows per page and `max_page_size` the most a caller can ask for.
+
+    With `DjangoRequestHandler(identity_map=True)` `_get_model` lookups by 
+    model class are shared by all the invocations of a request, call 
+    `_invalidate_model` after writes that change what a lookup would find.
+    """
     request = None #This is to provide a hook for the analysis in my IDE...
+    identity_map = None
+    page_size = 50
+    max_page_size = 200
 
     def _find_models(self, model, start=0, limit=50, **kw):
         return _get_queryset(model).filter(**kw)[start:limit]
 
+    def _page_models(self, model, cursor=None, page_size=None, order_by=('pk',), **kw):
+        """
+        Keyset pagination, returns a `Page`. Instead of an offset the next 
+        page is found from the ordering values of the last row, so deep pages 
+        cost the same as the first. `cursor` is the `next_cursor` of the 
+        previous page. The `order_by` columns should be indexed and not null, 
+        the primary key is added as the tie breaker.
+        """
+        queryset = _get_queryset(model)
+        pk_name = queryset.model._meta.pk.name
+        ordering = []
+        for name in order_by:
+            descending, name = name.startswith('-'), name.lstrip('-')
+            ordering.append((pk_name if name == 'pk' else name, descending))
+        if pk_name not in [ name for name, _ in ordering ]:
+            ordering.append((pk_name, ordering[-1][1] if ordering else False))
+
+        queryset = queryset.filter(**kw).order_by(*[ ('-' if d else '') + name for name, d in ordering ])
+        if cursor:
+            queryset = queryset.filter(keyset_filter(ordering, load_cursor(cursor, ordering)))
+        return Page(queryset, min(page_size or self.page_size, self.max_page_size), ordering)
+
     def _get_model(self, model, **kw):
+        if self.identity_map is None or not isinstance(model, type):
+            return self._lookup_model(model, **kw)
+        return self.identity_map.get(model, kw, self._lookup_model)
+
+    def _invalidate_model(self, model=None, **kw):
+        if self.identity_map is not None:
+            self.identity_map.invalidate(model, **kw)
+
+    def _lookup_model(self, model, **kw):
         try:
             return _get_queryset(model).get(**kw)
         except ObjectDoesNotExist:
@@ -28,9 +85,219 @@ class DjangoContainer(MethodContainer):
             raise APIFault('Your reference was bad, multiple records returned from lookup.', http_code=400)
 
 
+def keyset_filter(ordering, values):
+    """
+    The rows after `values` in `ordering`: (a > x) OR (a = x AND b > y) ...
+    """
+    condition = None
+    for i, (name, descending) in enumerate(ordering):
+        after = Q(**{'%s__%s' % (name, 'lt' if descending else 'gt'): values[i]})
+        for (previous, _), value in zip(ordering[:i], values[:i]):
+            after &= Q(**{previous: value})
+        condition = after if condition is None else condition | after
+    return condition
+
+
+def load_cursor(cursor, ordering):
+    try:
+        signed_ordering, values = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise APIFault('The cursor is not valid.', http_code=400)
+    if signed_ordering != [ [name, descending] for name, descending in ordering ]:
+        raise APIFault('The cursor belongs to a different ordering.', http_code=400)
+    return values
+
+
+def cursor_value(field, row):
+    """
+    The value of `field` as it's kept in a cursor. JSON holds numbers and 
+    strings exactly, anything else (ie. Decimals, dates) goes as the string 
+    the field itself writes.
+    """
+    value = field.value_from_object(row)
+    if value is None or isinstance(value, (bool, int, long, float, basestring)):
+        return value
+    return field.value_to_string(row)
+
+
+class Page(object):
+    """
+    One page of a keyset paginated queryset (see `DjangoContainer._page_models`). 
+    `DjangoTranslator` evaluates it to {'items': [...], 'next_cursor': ..., 
+    'has_more': ...}, next_cursor is None on the last page.
+    """
+    def __init__(self, queryset, page_size, ordering):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.ordering = ordering
+
+    def fetch(self, queryset=None):
+        """
+        Returns the rows of the page and the cursor to the next one.
+        """
+        queryset = self.queryset if queryset is None else queryset
+        rows = list(queryset[:self.page_size + 1]) #One more tells if there is a next page.
+        if len(rows) <= self.page_size:
+            return rows, None
+        rows = rows[:self.page_size]
+        return rows, self.cursor(rows[-1])
+
+    def cursor(self, row):
+        #The direction is signed too, a cursor is only good for the ordering it came from.
+        _meta = row._meta
+        values = [ cursor_value(_meta.get_field(name), row) for name, _ in self.ordering ]
+        return signing.dumps([self.ordering, values], salt=CURSOR_SALT, compress=True)
+
+
+class IdentityMap(object):
+    """
+    Memoizes `DjangoContainer._get_model` for one request. Lookups are keyed 
+    by model class and keywords (model instances count by primary key), 
+    found instances are also filed under their primary key and failed 
+    lookups are remembered too.
+    """
+    def __init__(self):
+        self.hits = self.misses = 0
+        self._entries = {} #(model class, normalized keywords) -> instance or (reason, http_code) of the fault
+        self._lock = threading.Lock()
+
+    def key(self, model, kw):
+        pk_names = ('pk', model._meta.pk.name, model._meta.pk.name + '__exact', 'pk__exact')
+        normalized = {}
+        for name, value in kw.iteritems():
+            if isinstance(value, Model):
+                value = value.pk
+            normalized['pk' if name in pk_names else name] = value
+        return model, canonical_key(normalized)
+
+    def get(self, model, kw, lookup):
+        key = self.key(model, kw)
+        with self._lock:
+            entry = self._entries.get(key, MISSING)
+            if entry is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is not MISSING:
+            if isinstance(entry, tuple):
+                raise APIFault(entry[0], http_code=entry[1])
+            return entry
+
+        try:
+            instance = lookup(model, **kw)
+        except APIFault as e:
+            with self._lock:
+                self._entries[key] = (e.reason, e.http_code)
+            raise
+        with self._lock:
+            self._entries[key] = instance
+            self._entries[self.key(model, {'pk': instance.pk})] = instance
+        return instance
+
+    def invalidate(self, model=None, **kw):
+        """
+        Forget one lookup, every lookup of a model, or everything. Forgetting 
+        a lookup that found an instance forgets every other key it's under.
+        """
+        with self._lock:
+            if model is None:
+                self._entries.clear()
+            elif kw:
+                entry = self._entries.pop(self.key(model, kw), None)
+                if entry is not None and not isinstance(entry, tuple):
+                    for key in [ k for k, v in self._entries.iteritems() if v is entry ]:
+                        del self._entries[key]
+            else:
+                for key in [ k for k in self._entries if k[0] is model ]:
+                    del self._entries[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0}
+
+
 class DjangoRequestHandler(RequestHandler):
+    """
+    Pass `count_queries=True` to record how many queries each invocation 
+    runs, and `max_queries` to fail invocations that run more than that.
+
+    Error responses carry tracebacks when EASYRPC_VERBOSE_ERRORS (or DEBUG 
+    when that isn't set) is on in settings, unless `verbose_errors` is given.
+
+    With `identity_map=True` every request gets an `IdentityMap` that its 
+    containers share (see `DjangoContainer`), `identity_map_stats` adds up 
+    the hits and misses of all requests.
+
+    With `concurrency` pool threads close their database connections after 
+    every invocation.
+    """
+    def __init__(self, services, count_queries=False, max_queries=None, identity_map=False, **kw):
+        self.count_queries = count_queries or max_queries is not None
+        self.max_queries = max_queries
+        self.identity_map = identity_map
+        self.identity_map_hits = self.identity_map_misses = 0
+        self._identity_map_lock = threading.Lock()
+        super(DjangoRequestHandler, self).__init__(services, **kw)
+
+    def default_verbose_errors(self):
+        return getattr(settings, 'EASYRPC_VERBOSE_ERRORS', settings.DEBUG)
+
+    def release_thread(self):
+        #request_finished only closes the request thread's connections, Django 1.6+ keeps persistent ones.
+        for connection in connections.all():
+            getattr(connection, 'close_if_unusable_or_obsolete', connection.close)()
+
+    def handle_request(self, request_body, method, environ, **kw):
+        if not self.identity_map:
+            return super(DjangoRequestHandler, self).handle_request(request_body, method, environ, **kw)
+
+        identity_map = kw['identity_map'] = IdentityMap()
+        try:
+            return super(DjangoRequestHandler, self).handle_request(request_body, method, environ, **kw)
+        finally:
+            stats = identity_map.stats()
+            logger.debug('Identity map: %(hits)d hits, %(misses)d misses.', stats)
+            with self._identity_map_lock:
+                self.identity_map_hits += stats['hits']
+                self.identity_map_misses += stats['misses']
+
+    def identity_map_stats(self):
+        lookups = self.identity_map_hits + self.identity_map_misses
+        return {'hits': self.identity_map_hits, 'misses': self.identity_map_misses, 
+                'hit_rate': float(self.identity_map_hits) / lookups if lookups else 0.0}
+
+    def invoke(self, invocation, **kw):
+        if not self.count_queries:
+            return super(DjangoRequestHandler, self).invoke(invocation, **kw)
+
+        debug_cursors = [ (c, c.use_debug_cursor) for c in connections.all() ]
+        started = []
+        for connection, _ in debug_cursors:
+            connection.use_debug_cursor = True
+            started.append(len(connection.queries))
+        try:
+            result = super(DjangoRequestHandler, self).invoke(invocation, **kw)
+        finally:
+            count = 0
+            for (connection, previous), start in zip(debug_cursors, started):
+                count += len(connection.queries) - start
+                connection.use_debug_cursor = previous
+                if not (previous or previous is None and settings.DEBUG):
+                    #Only logged to be counted, nothing else would clear them (ie. on pool threads).
+                    del connection.queries[start:]
+            invocation.additional['query_count'] = count
+            logger.debug('%s ran %d queries.', invocation.method_name, count)
+
+        if self.max_queries is not None and count > self.max_queries:
+            raise AssertionError('%s ran %d queries, the limit is %d.' % (invocation.method_name, count, self.max_queries))
+        return result
+
     def __call__(self, request):
-        payload = request.raw_post_data if request.method == 'POST' else request.GET.get('payload', '{}')
+        if request.method == 'POST':
+            payload = self.read_body(request, getattr(self.select_interface(request.META), 'max_body_bytes', None))
+        else:
+            payload = request.GET.get('payload', '{}')
         content = self.handle_request(payload, method=request.method, environ=request.META,
                                       request=request, querystring_dict=request.GET)
         headers = {}
@@ -38,25 +305,63 @@ class DjangoRequestHandler(RequestHandler):
             headers = content[1]
             content = content[0]
 
-        response = HttpResponse(content, content_type=self.interface.content_type)
+        response_class = StreamingHttpResponse if self.stream else HttpResponse
+        response = response_class(content, content_type=self.interface.content_type)
 
         for header, value in headers.items():
             response[header] = value
         return response
 
+    def read_body(self, request, limit=None):
+        #A body that says it's over the limit is only read far enough for the interface to see it.
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if limit is not None and length > limit:
+            return request.read(limit + 1)
+        return request.raw_post_data
+
+
+class SerializationPlan(tuple):
+    """
+    A compiled list of (key, getter) pairs for a model. `relations` holds 
+    the (kind, name, model, fields) of every relation the plan follows and 
+    `only` the concrete fields it reads, or None when it reads arbitrary 
+    attributes.
+    """
+    relations = ()
+    only = None
+
 
 class DjangoTranslator(PlainTranslator):
     """
     A special version of the tranlator that also includes querysets and models.
     ABCs might be able to avoid this special casing in the INIT
+
+    Querysets are given the select_related/prefetch_related/only calls 
+    their serialization needs before they are evaluated, set 
+    `optimize_queries` to False to turn this off.
+
+    When `stream_chunk_size` is set, unevaluated querysets translate to 
+    generators instead of lists (see `StreamingDjangoTranslator`).
     """
+    optimize_queries = True
+    max_related_depth = 3
+    stream_chunk_size = None
+
     def __init__(self, *a, **kw):
+        self._plans = {} #(model class, fields, exclude) -> compiled plan
         super(DjangoTranslator, self).__init__(*a, **kw)
 
+    def add_defaults(self):
+        super(DjangoTranslator, self).add_defaults()
+
         self.add_type((ValuesListQuerySet, ValuesQuerySet),
                       lambda x: [ self.resolve(v) for v in x ])
         self.add_type(Model, self._model)
         self.add_type(QuerySet, self._qs)
+        self.add_type(Page, self._page)
 
     def get_field_picks(self, model_class, typemapper):
         fields, exclude = (), ()
@@ -68,17 +373,173 @@ class DjangoTranslator(PlainTranslator):
                     exclude = rules['exclude']
         return fields, exclude
 
+    def resolve_columnar(self, obj):
+        """
+        Querysets go straight to columns and rows without building a dict 
+        per row. Keys a plan leaves out for a row are None in that row.
+        """
+        if isinstance(obj, Page):
+            return self._page(obj, columnar=True)
+        if isinstance(obj, (ValuesListQuerySet, ValuesQuerySet)):
+            return self._values_columnar(obj)
+        if isinstance(obj, QuerySet):
+            plan, deferred = self.queryset_plan(obj)
+            return {'columns': [ key for key, getter in plan ], 
+                    'rows': self.translate_rows(obj, plan, deferred, self.apply_plan_row)}
+        return super(DjangoTranslator, self).resolve_columnar(obj)
+
+    def _values_columnar(self, data):
+        if getattr(data, 'flat', False):
+            return self.resolve(data)
+        columns = list(data.query.extra_select) + list(data.field_names) + list(data.query.aggregate_select)
+        if isinstance(data, ValuesListQuerySet):
+            if data._fields and len(columns) > len(data.field_names):
+                #With extra columns values_list orders the rows by the names it was given.
+                columns = list(data._fields) + [ a for a in data.query.aggregate_select if a not in data._fields ]
+            return {'columns': columns, 'rows': [ self.resolve(row) for row in data ]}
+        get = itemgetter(*columns) if len(columns) != 1 else lambda row: (row[columns[0]],)
+        return {'columns': columns, 'rows': [ self.resolve(get(row)) for row in data ]}
+
     # MODELS are a bit more complex because of fields.
     def _qs(self, data, fields=(), exclude=()):
         """
         Querysets.
         """
+        plan, deferred = self.queryset_plan(data, fields, exclude)
+        return self.translate_rows(data, plan, deferred, self.apply_plan)
+
+    def _page(self, page, columnar=False):
+        """
+        Pages, the rows are read with the same optimizations as querysets. 
+        The ordering columns are always loaded, the cursor is made from them.
+        """
+        queryset = page.queryset
+        plan, deferred = self.queryset_plan(queryset)
+        if self.optimize_queries:
+            queryset = self.optimize_queryset(queryset, plan, deferred=True)
+            if plan.only is not None and not deferred:
+                queryset = self.restrict_columns(queryset, set(plan.only).union([ name for name, _ in page.ordering ]))
+        rows, next_cursor = page.fetch(queryset)
+        if columnar:
+            items = {'columns': [ key for key, getter in plan ], 
+                     'rows': [ self.apply_plan_row(plan, row) for row in rows ]}
+        else:
+            items = [ self.apply_plan(plan, row) for row in rows ]
+        return {'items': items, 'next_cursor': next_cursor, 'has_more': next_cursor is not None}
+
+    def queryset_plan(self, data, fields=(), exclude=()):
+        """
+        Returns the plan for a queryset's rows and whether it defers fields.
+        """
         if (not fields and not exclude) and hasattr(data, 'typemapper'):
             fields, exclude = self.get_field_picks(data.model, data.typemapper)
         defer_plan = data.query.get_loaded_field_names()
         if data.model in defer_plan:
             fields = defer_plan[data.model]
-        return [ self._model(v, fields, exclude) for v in data ]
+            deferred = True
+        else:
+            deferred = False
+        return self.get_plan(data.model, fields, exclude), deferred
+
+    def translate_rows(self, data, plan, deferred, apply):
+        """
+        `apply(plan, row)` for every row, with the queries optimized or 
+        streamed when the queryset hasn't been evaluated yet.
+        """
+        if data._result_cache is None:
+            if self.stream_chunk_size:
+                return self._qs_stream(data, plan, deferred, apply)
+            if self.optimize_queries:
+                data = self.optimize_queryset(data, plan, deferred)
+        return [ apply(plan, v) for v in data ]
+
+    def _qs_stream(self, data, plan, deferred=False, apply=None):
+        """
+        Querysets, lazily. Rows are read with `iterator()` and translated 
+        `stream_chunk_size` at a time, prefetches are run per chunk since 
+        `iterator()` skips them.
+        """
+        apply = apply or self.apply_plan
+        prefetch = list(data._prefetch_related_lookups)
+        if self.optimize_queries:
+            data, extra = self.optimize_queryset(data, plan, deferred, prefetch=False)
+            prefetch.extend(p for p in extra if p not in prefetch)
+
+        rows = data.iterator()
+        while True:
+            chunk = list(islice(rows, self.stream_chunk_size))
+            if not chunk:
+                break
+            if prefetch:
+                prefetch_related_objects(chunk, prefetch)
+            for row in chunk:
+                yield apply(plan, row)
+
+    def optimize_queryset(self, data, plan, deferred=False, prefetch=True):
+        """
+        Apply the joins, prefetches and column restrictions a plan will need.
+        With `prefetch=False` the prefetch lookups are returned alongside 
+        the queryset instead of being applied.
+        """
+        select, lookups = [], []
+        self.related_lookups(plan, select, lookups)
+        if select:
+            data = data.select_related(*select)
+        if plan.only is not None and not deferred:
+            data = self.restrict_columns(data, plan.only)
+        if not prefetch:
+            return data, lookups
+        lookups = [ p for p in lookups if p not in data._prefetch_related_lookups ]
+        if lookups:
+            data = data.prefetch_related(*lookups)
+        return data
+
+    def restrict_columns(self, data, columns):
+        """
+        `only(*columns)`, keeping the relations the queryset already selects 
+        (they can't be deferred). select_related() with no arguments follows 
+        every relation, those querysets are left alone.
+        """
+        select_related = data.query.select_related
+        if select_related is True:
+            return data
+        if select_related:
+            columns = set(columns).union(select_related)
+        return data.only(*columns)
+
+    def related_lookups(self, plan, select, prefetch, prefix='', prefetching=False, seen=()):
+        """
+        Walk the relations of a plan, filling in `select` with the lookups 
+        that can be joined and `prefetch` with the ones that need their own query.
+        """
+        if len(seen) >= self.max_related_depth:
+            return
+        for kind, name, model, fields in plan.relations:
+            if model in seen:
+                continue
+            lookup = prefix + name
+            if kind == 'fk' and not prefetching:
+                select.append(lookup)
+            else:
+                prefetch.append(lookup)
+            self.related_lookups(self.get_plan(model, fields), select, prefetch,
+                                 lookup + '__', prefetching or kind != 'fk', seen + (model,))
+
+    def get_relation(self, model_class, name):
+        """
+        Returns the kind ('fk', 'm2m' or 'reverse') and model of a relation by attribute name.
+        """
+        _meta = model_class._meta
+        for f in _meta.fields:
+            if f.rel and f.name == name:
+                return 'fk', f.rel.to
+        for f in _meta.many_to_many:
+            if f.name == name:
+                return 'm2m', f.rel.to
+        for rel in _meta.get_all_related_objects() + _meta.get_all_related_many_to_many_objects():
+            if rel.get_accessor_name() == name:
+                return 'reverse', rel.model
+        return None, None
 
     def _fk(self, data, field):
         """
@@ -90,41 +551,68 @@ class DjangoTranslator(PlainTranslator):
         """
         Foreign keys.
         """
-        return [ self._model(m, fields) for m in data.iterator() ]
+        return [ self._model(m, fields) for m in data.all() ]
 
     def _m2m(self, data, field, fields=()):
         """
         Many to many (re-route to `_model`.)
         """
-        return [ self._model(m, fields) for m in getattr(data, field.name).iterator() ]
+        return [ self._model(m, fields) for m in getattr(data, field.name).all() ]
 
     def _model(self, data, fields=(), exclude=()):
         """
         Models. Will respect the `fields` and/or
         `exclude` on the handler (see `typemapper`.)
         """
-        #handler = self.in_typemapper(type(data), self.anonymous)
-        ret = { }
-
         if (not fields and not exclude) and hasattr(data, 'typemapper'):
             fields, exclude = self.get_field_picks(data.__class__, data.typemapper)
+        return self.apply_plan(self.get_plan(data.__class__, fields, exclude), data)
+
+    def apply_plan(self, plan, data):
+        ret = { }
+        for key, getter in plan:
+            value = getter(data)
+            if value is not NoValue:
+                ret[key] = value
+        return ret
+
+    def apply_plan_row(self, plan, data):
+        row = [ getter(data) for key, getter in plan ]
+        return [ None if value is NoValue else value for value in row ]
+
+    def get_plan(self, model_class, fields=(), exclude=()):
+        """
+        Returns the compiled serialization plan for a model class and field 
+        selection, compiling it on first use. All of the `_meta` and 
+        `exclude` work happens here once instead of on every row.
+        """
+        if not fields and not exclude:
+            typemapper = getattr(model_class, 'typemapper', None)
+            if typemapper:
+                fields, exclude = self.get_field_picks(model_class, typemapper)
+
+        key = (model_class, frozenset(fields), frozenset(exclude))
+        try:
+            return self._plans[key]
+        except KeyError:
+            plan = self._plans[key] = self.compile_plan(model_class, fields, exclude)
+            return plan
 
-        v = lambda f: getattr(data, f.attname)
+    def compile_plan(self, model_class, fields=(), exclude=()):
+        """
+        Build an ordered list of (key, getter) pairs for a model. Getters 
+        return `NoValue` when the key should be left out for that row.
+        """
+        plan, relations, only = [], [], set([model_class._meta.pk.name])
+        _meta = model_class._meta
 
         if not fields:
-            get_fields = set([ f.attname.replace("_id", "", 1) for f in data._meta.fields ])
+            get_fields = set([ f.attname.replace("_id", "", 1) for f in _meta.fields ])
         else:
             get_fields = set(fields)
-            # Brute force version
-            #for f in data._meta.fields:
-            #    ret[f.attname] = _any(getattr(data, f.attname))
 
         exclude_fields = set(exclude).difference(fields)
 
-        #get_absolute_uri = False
-        #if 'absolute_uri' in get_fields:
-        #    get_absolute_uri = True
-
         # sets can be negated.
         for exclude in exclude_fields:
             if isinstance(exclude, basestring):
@@ -137,77 +625,99 @@ class DjangoTranslator(PlainTranslator):
 
         #Method Fields; This was originally for calling methods on the handler.
         #met_fields = method_fields(handler, get_fields)
-        met_fields = ()
-        for f in data._meta.local_fields:
-            if f.serialize and not any([ p in met_fields for p in [ f.attname, f.name ]]):
-                if f.attname in get_fields and hasattr(data, 'get_%s_display' % f.attname):
-                    ret['%s_display' % f.attname] = getattr(data, 'get_%s_display' % f.attname)()
+        for f in _meta.local_fields:
+            if f.serialize:
+                if f.attname in get_fields and hasattr(model_class, 'get_%s_display' % f.attname):
+                    plan.append(('%s_display' % f.attname, methodcaller('get_%s_display' % f.attname)))
 
                 if not f.rel:
                     if f.attname in get_fields:
-                        ret[f.attname] = self.resolve(v(f))
-                        get_fields.remove(f.attname)
+                        plan.append((f.attname, self._plan_attr(f.attname)))
+                        get_fields.discard(f.attname)
+                        only.add(f.name)
                 else:
                     if f.attname[:-3] in get_fields:
-                        ret[f.name] = self._fk(data, f)
-                        get_fields.remove(f.name)
+                        plan.append((f.name, self._plan_fk(f)))
+                        get_fields.discard(f.name)
+                        relations.append(('fk', f.name, f.rel.to, ()))
+                        only.add(f.name)
 
-        for mf in data._meta.many_to_many:
-            if mf.serialize and mf.attname not in met_fields:
+        for mf in _meta.many_to_many:
+            if mf.serialize:
                 if mf.attname in get_fields:
-                    ret[mf.name] = self._m2m(data, mf)
-                    get_fields.remove(mf.name)
+                    plan.append((mf.name, self._plan_m2m(mf)))
+                    get_fields.discard(mf.name)
+                    relations.append(('m2m', mf.name, mf.rel.to, ()))
+
+        #Columns that aren't serialized (ie. an AutoField pk) can still be asked for by name.
+        columns = dict([ (f.attname, f.name) for f in _meta.fields ] + [ (f.name, f.name) for f in _meta.fields ])
+        columns['pk'] = _meta.pk.name
 
         # try to get the remainder of fields
         for maybe_field in get_fields:
-
             if isinstance(maybe_field, (list, tuple)):
-                model, fields = maybe_field
-                inst = getattr(data, model, None)
-
-                if inst:
-                    if hasattr(inst, 'all'):
-                        ret[model] = self._related(inst, fields)
-                    elif callable(inst):
-                        if len(inspect.getargspec(inst)[0]) == 1:
-                            ret[model] = self.resolve(inst())#, fields)
-                    else:
-                        ret[model] = self._model(inst, fields)
-
-            elif maybe_field in met_fields:
-                # Overriding normal field which has a "resource method"
-                # so you can alter the contents of certain fields without
-                # using different names.
-                ret[maybe_field] = self.resolve(met_fields[maybe_field](data))
-
+                model, sub_fields = maybe_field
+                plan.append((model, self._plan_nested(model, sub_fields)))
+                kind, related_model = self.get_relation(model_class, model)
+                if kind is not None:
+                    relations.append((kind, model, related_model, sub_fields))
+                    if kind == 'fk' and only is not None:
+                        only.add(model)
+                else:
+                    only = None
             else:
-                maybe = getattr(data, maybe_field, None)
-                if maybe:
-                    if callable(maybe):
-                        if len(inspect.getargspec(maybe)[0]) == 1:
-                            ret[maybe_field] = self.resolve(maybe())
-                    else:
-                        ret[maybe_field] = self.resolve(maybe)
-
-    #    else:
-    #        for f in data._meta.fields:
-    #            ret[f.attname] = Transformer.resolve(getattr(data, f.attname))
-    #
-    #        fields = dir(data.__class__) + ret.keys()
-    #        add_ons = [k for k in dir(data) if k not in fields and not k.startswith('_')]
-    #
-    #        for k in add_ons:
-    #            ret[k] = Transformer.resolve(getattr(data, k))
-
-        #if hasattr(data, 'get_api_url') and 'resource_uri' not in ret:
-        #    try:
-        #        ret['resource_uri'] = data.get_api_url()
-        #    except: pass
-
-        # absolute uri
-        #if hasattr(data, 'get_absolute_url') and get_absolute_uri:
-        #    try:
-        #        ret['absolute_uri'] = data.get_absolute_url()
-        #    except: pass
+                plan.append((maybe_field, self._plan_maybe(maybe_field)))
+                if maybe_field not in columns:
+                    only = None
+                elif only is not None:
+                    only.add(columns[maybe_field])
+
+        plan = SerializationPlan(plan)
+        plan.relations = tuple(relations)
+        #Without explicit fields every column is read anyway.
+        plan.only = tuple(only) if fields and only is not None else None
+        return plan
+
+    def _plan_attr(self, attname):
+        resolve, get = self.resolve, attrgetter(attname)
+        return lambda data: resolve(get(data))
+
+    def _plan_fk(self, field):
+        return lambda data: self._fk(data, field)
+
+    def _plan_m2m(self, field):
+        return lambda data: self._m2m(data, field)
+
+    def _plan_nested(self, name, fields):
+        def nested(data):
+            inst = getattr(data, name, None)
+            if inst:
+                if hasattr(inst, 'all'):
+                    return self._related(inst, fields)
+                elif callable(inst):
+                    if len(inspect.getargspec(inst)[0]) == 1:
+                        return self.resolve(inst())#, fields)
+                else:
+                    return self._model(inst, fields)
+            return NoValue
+        return nested
+
+    def _plan_maybe(self, name):
+        def maybe_field(data):
+            maybe = getattr(data, name, None)
+            if maybe:
+                if callable(maybe):
+                    if len(inspect.getargspec(maybe)[0]) == 1:
+                        return self.resolve(maybe())
+                else:
+                    return self.resolve(maybe)
+            return NoValue
+        return maybe_field
 
-        return ret
+
+class StreamingDjangoTranslator(DjangoTranslator):
+    """
+    Translates querysets lazily so rows are encoded as they are read, it 
+    needs `DjangoRequestHandler(stream=True)`.
+    """
+    stream_chunk_size = 100
@@ -2,20 +2,28 @@
 I put these in their own file to facilitate the lack 
 of circular import errors
 """
-import sys
+import sys, traceback
 
 class NoTransformer(Exception): 
     pass
 
 
 class EAPIException(Exception):
+    """
+    Tracebacks are not kept by default, `capture_trace` extracts the one 
+    being handled when verbose errors are wanted. The frames themselves 
+    are never stored so they can be released as soon as possible.
+    """
     http_code = 500
+    trace = None
     def __init__(self, reason, orig=None, **kw):
-        self.etype, self.evalue, self.etrace = sys.exc_info()
         self.reason = reason
         self.orig = orig
         self.__dict__.update(kw)
 
+    def capture_trace(self):
+        self.trace = traceback.extract_tb(sys.exc_info()[2])
+
 
 class InvalidPayloadException(EAPIException):
     http_code = 400 #Bad Request
@@ -38,4 +46,12 @@ class APIFault(EAPIException):
 
 
 class InvalidParameters(EAPIException):
-    http_code = 400
\ No newline at end of file
+    http_code = 400
+
+
+class InvocationTimeout(EAPIException):
+    http_code = 504
+
+
+class InvocationNotStarted(EAPIException):
+    http_code = 503
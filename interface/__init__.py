@@ -6,10 +6,40 @@ layer.
 class RPCRequest(object):
     """
     This is a container of the entire request.
+
+    When `translator` is set the invocation results are raw method results 
+    and the interface translates them while encoding.
+
+    `invocations` can be an iterator, iterating the request then decodes 
+    them as it goes so they can run before the rest of a batch is read. 
+    The `invocations` attribute reads whatever is left.
     """
     def __init__(self, invocations, **params):
-        self.invocations = invocations
+        self._invocations = invocations if isinstance(invocations, list) else []
+        self._pending = None if isinstance(invocations, list) else iter(invocations)
         self.params = params
+        self.translator = None
+
+    @property
+    def invocations(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._invocations.extend(pending)
+        return self._invocations
+
+    def __iter__(self):
+        index = 0
+        while True:
+            if index < len(self._invocations):
+                yield self._invocations[index]
+                index += 1
+            elif self._pending is None:
+                return
+            else:
+                try:
+                    self._invocations.append(next(self._pending))
+                except StopIteration:
+                    self._pending = None
 
     def unresolved(self):
         for i in self.invocations:
@@ -49,6 +79,7 @@ class MethodInvocation(object):
 
 class BaseInterface(object):
     mime_type = 'text/plain'
+    encodes_with_translator = False #Whether `response` translates raw results itself, see `RPCRequest`.
     
     def parse(self, content, method, environ, **kw):
         """
@@ -60,4 +91,14 @@ class BaseInterface(object):
         """
         Results is the completed rpc_request object plus additional headers (If applicable)
         """
-        raise NotImplementedError()
\ No newline at end of file
+        raise NotImplementedError()
+
+    def response_stream(self, rpc_request, verbose_errors=False):
+        """
+        Same as `response` but always returns (iterable of chunks, headers). 
+        Interfaces that can encode incrementally should override this.
+        """
+        content = self.response(rpc_request, verbose_errors)
+        if isinstance(content, (tuple, list)):
+            return [content[0]], content[1]
+        return [content], {}
\ No newline at end of file
@@ -4,119 +4,303 @@ Handler that can speak JSON RPC
 
 
 """
-import traceback, datetime, calendar
+import datetime, calendar, types, re
 import urlparse
 from . import BaseInterface, MethodInvocation, RPCRequest
-from ..utils import LocalTimezone, UTC
-from ..exceptions import InvalidPayloadException
+from ..utils import utc, to_utc
+from ..exceptions import InvalidPayloadException, EAPIException
 
-try: 
-    import simplejson as json
-except ImportError: 
-    import json
+def default_json_module():
+    """
+    simplejson when it's installed, otherwise the stdlib json. Imported on 
+    first use rather than at import time, it's slow to load.
+    """
+    try: 
+        import simplejson as json
+    except ImportError: 
+        import json
+    return json
 
 #How to get UTC (THIS DOES NOT HANDLE ALL CASES)
 #datetime.datetime.now() + datetime.timedelta(seconds=time.timezone) - datetime.timedelta(hours=(1 if time.daylight != 0 else 0))
 
-def datetime_json_default(obj):
+def utc_datetime(obj):
     """
-    The primary role of this function is to convert datetime instances
-    into a JSON representation of a UTC datetime.
+    Returns dates and datetimes as UTC datetimes, naive values are taken 
+    as local time. Raises TypeError for anything else.
     """
     if type(obj) is datetime.date:
         #Convert to datetime
         obj = datetime.datetime.combine(obj, datetime.time())
     if type(obj) is datetime.datetime:
-        #If object is naive, replace the lack of a timezone with the locally derived timezone.
-        if obj.tzinfo is None or obj.tzinfo.utcoffset(obj) is None:
-            obj = obj.replace(tzinfo=LocalTimezone(obj))
-        utc_obj = obj.astimezone(UTC())
-        return {'__complex__': 'datetime',
-                'tz': 'UTC',
-                'epoch': calendar.timegm(utc_obj.timetuple()),
-                'iso8601': utc_obj.isoformat(' ')}
+        return to_utc(obj)
     raise TypeError()
 
+def datetime_json_default(obj):
+    """
+    The primary role of this function is to convert datetime instances
+    into a JSON representation of a UTC datetime.
+    """
+    utc_obj = utc_datetime(obj)
+    return {'__complex__': 'datetime',
+            'tz': 'UTC',
+            'epoch': calendar.timegm(utc_obj.timetuple()),
+            'iso8601': utc_obj.isoformat(' ')}
+
+def datetime_epoch_default(obj):
+    """
+    Datetimes as UTC epoch seconds only.
+    """
+    return calendar.timegm(utc_datetime(obj).timetuple())
+
+def datetime_iso_default(obj):
+    """
+    Datetimes as UTC ISO 8601 strings only.
+    """
+    return utc_datetime(obj).isoformat(' ')
+
+#Wire formats for datetimes, see `JSONRPCInterface`.
+DATETIME_FORMATS = {
+    'complex': datetime_json_default,
+    'epoch': datetime_epoch_default,
+    'iso': datetime_iso_default,
+}
+
+def translator_json_default(translator, fallback=datetime_json_default):
+    """
+    Returns a `default` hook that translates values the encoder can't 
+    handle itself, so raw results can be encoded without copying them first.
+    """
+    def default(obj):
+        transformer = translator.get_transformer(obj)
+        if transformer is None:
+            return fallback(obj)
+        return transformer(obj)
+    return default
+
+#Types the encoders write themselves, nothing else needs the translator.
+NATIVE_TYPES = (basestring, bool, int, long, float, types.NoneType)
+
 def datetime_json_object_hook(obj):
     if '__complex__' in obj:
-        return datetime.datetime.fromtimestamp(obj['epoch'], UTC())
+        return datetime.datetime.fromtimestamp(obj['epoch'], utc)
     return obj
 
+def nesting_exceeds(obj, depth):
+    """
+    True when `obj` has more than `depth` levels of nested lists and dicts.
+    """
+    if isinstance(obj, dict):
+        values = obj.itervalues()
+    elif isinstance(obj, list):
+        values = obj
+    else:
+        return False
+    if depth <= 0:
+        return True
+    for value in values:
+        if nesting_exceeds(value, depth - 1):
+            return True
+    return False
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONBackend(object):
+    """
+    Encoding backend for `JSONRPCInterface`. Wraps any module with json 
+    compatible `dumps`/`loads`, such as the stdlib json or simplejson. 
+    Without one `default_json_module` is loaded when it's first needed.
+
+    Backends whose `dumps` doesn't call `default` for every object it 
+    can't encode set `calls_default = False`, they can't translate on encode.
+    """
+    calls_default = True
+
+    def __init__(self, module=None):
+        self._module = module
+
+    @property
+    def module(self):
+        if self._module is None:
+            self._module = default_json_module()
+        return self._module
+
+    @property
+    def decimal_option(self):
+        return getattr(self.module, '__name__', None) == 'simplejson'
+
+    def dumps(self, obj, default, pretty=False, native_decimal=True):
+        """
+        With `native_decimal=False` Decimals are left to `default`, 
+        simplejson would otherwise write them itself.
+        """
+        kw = {'use_decimal': False} if self.decimal_option and not native_decimal else {}
+        if pretty:
+            return self.module.dumps(obj, default=default, indent=4, **kw)
+        #Compact output also keeps the stdlib on its C encoder, which it skips when indenting.
+        return self.module.dumps(obj, default=default, separators=(',', ':'), **kw)
+
+    def loads(self, raw, object_hook):
+        return self.module.loads(raw, object_hook=object_hook)
+
+    def iterloads(self, raw, object_hook):
+        """
+        Decodes a top level array one item at a time, so the caller can stop 
+        early and never holds the whole decoded batch. Anything else is 
+        yielded whole. Modules without a `JSONDecoder` fall back to `loads`.
+        """
+        if not hasattr(self.module, 'JSONDecoder'):
+            decoded = self.loads(raw, object_hook)
+            for item in decoded if isinstance(decoded, list) else [decoded]:
+                yield item
+            return
+
+        decoder = self.module.JSONDecoder(object_hook=object_hook)
+        idx = WHITESPACE.match(raw).end()
+        if raw[idx:idx + 1] != '[':
+            yield decoder.decode(raw)
+            return
+
+        idx = WHITESPACE.match(raw, idx + 1).end()
+        if raw[idx:idx + 1] == ']':
+            idx = WHITESPACE.match(raw, idx + 1).end()
+        else:
+            while True:
+                item, idx = decoder.raw_decode(raw, idx)
+                yield item
+                idx = WHITESPACE.match(raw, idx).end()
+                separator = raw[idx:idx + 1]
+                idx = WHITESPACE.match(raw, idx + 1).end()
+                if separator == ']':
+                    break
+                if separator != ',':
+                    raise ValueError('Expecting , delimiter: char %d' % (idx - 1))
+        if idx != len(raw):
+            raise ValueError('Extra data: char %d' % idx)
+
 
 class JSONRPCInterface(BaseInterface):
     """
     JSONRPC 2.0 Interface.
+
+    Output is compact unless `pretty` is set, or the request's query string 
+    has a `pretty` parameter. `json_encoder` is a json compatible module or 
+    a `JSONBackend`.
+
+    `datetime_format` picks how datetimes are written: 'complex' (the 
+    `__complex__` dict with epoch and ISO string), 'epoch' or 'iso'.
+
+    Requests are refused before they run when the body is over 
+    `max_body_bytes` or a request nests lists and dicts deeper than 
+    `max_depth`. Batches run as they are decoded, past `max_batch_length` 
+    requests decoding stops and the rest is refused. None means no limit.
     """
     content_type = 'application/json'
+    stream_buffer_size = 64 * 1024 #Bytes collected before a streamed chunk is yielded.
+    max_body_bytes = None
+    max_batch_length = None
+    max_depth = None
     
-    def __init__(self, json_encoder=json):
-        self.json = json_encoder
-        
+    def __init__(self, json_encoder=None, pretty=False, datetime_format='complex', max_body_bytes=None,
+                 max_batch_length=None, max_depth=None):
+        self.backend = json_encoder if isinstance(json_encoder, JSONBackend) else JSONBackend(json_encoder)
+        self.pretty = pretty
+        self.datetime_default = DATETIME_FORMATS[datetime_format]
+        if max_body_bytes is not None:
+            self.max_body_bytes = max_body_bytes
+        if max_batch_length is not None:
+            self.max_batch_length = max_batch_length
+        if max_depth is not None:
+            self.max_depth = max_depth
+
+    @property
+    def json(self):
+        return self.backend.module
+
+    @property
+    def encodes_with_translator(self):
+        return self.backend.calls_default
+
     def parse(self, content, method, environ, **kw):
-        #This method really isn't very complex, except for the exception handling.
-        invocations = []
-        try:
-            #Well, this should be JSON for starters.
-            try:
-                decoded_content = self._decode_json(content)
-            except ValueError as e:
-                return RPCRequest([MethodInvocation(
-                    value=InvalidPayloadException('JSON request cannot be parsed.', orig=e, code=-32700),
-                    exception=True
-                )])
-
-            #Turn request into a list of requests even if it's not, since it's the way we process everything.
-            if not isinstance(decoded_content, (list, tuple)):
-                decoded_content = [decoded_content]
-        
-            for request in decoded_content:
-                #This is to verify that these keys exist, it is required in the JSON spec.
-                if not all(map(lambda x: x in request, ('id', 'jsonrpc', 'method'))) or \
-                    request.get('jsonrpc') != "2.0":
-                    mi = MethodInvocation(
-                        value=InvalidPayloadException("You must specify 'id', 'jsonrpc' and a 'method' attribute at the root and jsonrpc must equal '2.0'", code=-32600),
-                        exception=True
-                    )
-                else:
-                    mi = MethodInvocation(request.get('method'),
-                                          request.get('params', ()), 
-                                          request.get('id'))
-                invocations.append(mi)
-        except Exception as e:
-            invocations.append(
-                MethodInvocation(
-                    value=InvalidPayloadException(str(e), orig=e),
-                    exception=True
-                )
-            )
+        if self.max_body_bytes is not None and len(content or '') > self.max_body_bytes:
+            return self._refuse('The request is over %d bytes.' % self.max_body_bytes)
+        invocations = self._iter_invocations(content)
 
         jsonp_callback = None
         qs = kw.get('querystring_dict', urlparse.parse_qs(environ.get('QUERY_STRING')))
         if method == 'GET' and 'callback' in qs:
             jsonp_callback = qs.get('callback')
 
-        return RPCRequest(invocations, jsonp_callback=jsonp_callback)
+        return RPCRequest(invocations, jsonp_callback=jsonp_callback, pretty='pretty' in qs or None,
+                          columnar='columnar' in qs or None)
     
     def response(self, rpc_request, verbose_errors=False):
+        pretty, translator = rpc_request.params.get('pretty'), rpc_request.translator
         try:
-            if len(rpc_request.invocations) == 1:
-                output = self._wrap_object(rpc_request.invocations[0], verbose_errors)
+            if translator is None:
+                content = self._encode_json(self._wrap_request(rpc_request, verbose_errors), pretty)
             else:
-                output = [self._wrap_object(i, verbose_errors) for i in rpc_request.invocations]
+                content = self._encode_translated(rpc_request, verbose_errors, pretty, translator)
 
             jsonp_callback = rpc_request.params.get('jsonp_callback', None)
             if jsonp_callback is not None:
-                return '%s(%s);' % (jsonp_callback, self._encode_json(output)), \
+                return '%s(%s);' % (jsonp_callback, content), \
                     {'Content-Type': 'application/x-javascript'}
-            return self._encode_json(output)
+            return content
         except Exception as e:
             mi = MethodInvocation(
                 value=InvalidPayloadException(str(e), orig=e),
                 exception=True
             )
-            return self._encode_json(self._wrap_object(mi, verbose_errors))
+            return self._encode_json(self._wrap_object(mi, verbose_errors), pretty)
+
+    def response_stream(self, rpc_request, verbose_errors=False):
+        """
+        Encodes the response as it is iterated, generators in results 
+        (streamed querysets) are written item by item. Errors raised 
+        while streaming cut the response short, there is no way to 
+        replace an envelope that has already been sent.
+        """
+        jsonp_callback = rpc_request.params.get('jsonp_callback', None)
+        headers = {}
+        if jsonp_callback is not None:
+            headers['Content-Type'] = 'application/x-javascript'
+        return self._buffer(self._iter_response(rpc_request, verbose_errors, jsonp_callback)), headers
             
     #Implementation Specific methods follow
+    def _wrap_request(self, rpc_request, verbose_errors=False):
+        if len(rpc_request.invocations) == 1:
+            return self._wrap_object(rpc_request.invocations[0], verbose_errors)
+        return [self._wrap_object(i, verbose_errors) for i in rpc_request.invocations]
+
+    def _encode_translated(self, rpc_request, verbose_errors, pretty, translator):
+        """
+        Results are translated while encoding so they can fail here, each 
+        invocation is encoded on its own so a failure only turns that 
+        invocation into an error. Results can be generators, they are never 
+        encoded twice.
+        """
+        encoded = []
+        for invocation in rpc_request.invocations:
+            try:
+                encoded.append(self._encode_json(self._wrap_object(invocation, verbose_errors), pretty, translator))
+            except Exception as e:
+                error = EAPIException(str(e), orig=e)
+                if verbose_errors is True:
+                    error.capture_trace()
+                invocation.error(error)
+                encoded.append(self._encode_json(self._wrap_object(invocation, verbose_errors), pretty))
+        if len(encoded) == 1:
+            return encoded[0]
+        return self._encode_batch(encoded)
+
+    def _encode_batch(self, encoded):
+        """
+        Join separately encoded responses into one batch response.
+        """
+        return '[%s]' % ','.join(encoded)
+
     def _wrap_object(self, invocation, verbose_errors=False):
         if invocation.is_error:
             error = dict(
@@ -124,7 +308,7 @@ class JSONRPCInterface(BaseInterface):
                 reason=getattr(invocation.value, 'reason', None)
             )
             if verbose_errors is True:
-                error['traceback'] = traceback.extract_tb(invocation.value.etrace)
+                error['traceback'] = getattr(invocation.value, 'trace', None) or []
             return dict(
                 id=invocation.id,
                 jsonrpc="2.0",
@@ -136,17 +320,148 @@ class JSONRPCInterface(BaseInterface):
             result=invocation.value
         )
     
+    def _iter_response(self, rpc_request, verbose_errors, jsonp_callback):
+        if jsonp_callback is not None:
+            yield '%s(' % jsonp_callback
+        if len(rpc_request.invocations) == 1:
+            output = self._wrap_object(rpc_request.invocations[0], verbose_errors)
+        else:
+            output = (self._wrap_object(i, verbose_errors) for i in rpc_request.invocations)
+        for chunk in self._iter_encode(output, rpc_request.translator):
+            yield chunk
+        if jsonp_callback is not None:
+            yield ');'
+
+    def _iter_encode(self, obj, translator=None):
+        """
+        Walks containers yielding encoded pieces, everything else is 
+        handed to `_encode_json` whole. Streamed output is always compact.
+        """
+        if isinstance(obj, dict):
+            yield '{'
+            separator = ''
+            for key, value in obj.iteritems():
+                if not isinstance(key, basestring):
+                    key = self._encode_json(key, False) #Same key coercion as the encoder.
+                yield '%s%s:' % (separator, self._encode_json(key, False))
+                for chunk in self._iter_encode(value, translator):
+                    yield chunk
+                separator = ','
+            yield '}'
+        elif isinstance(obj, (list, tuple, types.GeneratorType)):
+            yield '['
+            separator = ''
+            for value in obj:
+                yield separator
+                for chunk in self._iter_encode(value, translator):
+                    yield chunk
+                separator = ','
+            yield ']'
+        elif translator is not None and not isinstance(obj, NATIVE_TYPES):
+            #Translate here so querysets that translate to generators are still streamed.
+            transformer = translator.get_transformer(obj)
+            if transformer is None:
+                yield self._encode_json(obj, False)
+            else:
+                for chunk in self._iter_encode(transformer(obj), translator):
+                    yield chunk
+        else:
+            yield self._encode_json(obj, False)
+
+    def _buffer(self, chunks):
+        buffered, size = [], 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= self.stream_buffer_size:
+                yield ''.join(buffered)
+                buffered, size = [], 0
+        if buffered:
+            yield ''.join(buffered)
+
+    def _invocation(self, request):
+        #This is to verify that these keys exist, it is required in the JSON spec.
+        if not all(map(lambda x: x in request, ('id', 'jsonrpc', 'method'))) or \
+            request.get('jsonrpc') != "2.0":
+            return MethodInvocation(
+                value=InvalidPayloadException("You must specify 'id', 'jsonrpc' and a 'method' attribute at the root and jsonrpc must equal '2.0'", code=-32600),
+                exception=True
+            )
+        if self.max_depth is not None and nesting_exceeds(request, self.max_depth):
+            return MethodInvocation(
+                value=InvalidPayloadException('Requests are limited to %d levels of nesting.' % self.max_depth, 
+                                              code=-32600),
+                id=request.get('id'),
+                exception=True
+            )
+        return MethodInvocation(request.get('method'), request.get('params', ()), request.get('id'))
+
+    def _iter_invocations(self, content):
+        """
+        Well, this should be JSON for starters. Batches are decoded a request at 
+        a time and each invocation is yielded before the next is decoded, so 
+        they can run while the rest is read. A batch that turns out to be 
+        malformed or over `max_batch_length` ends with an error in place of 
+        the rest, the invocations before it stay.
+        """
+        #This method really isn't very complex, except for the exception handling.
+        count = 0
+        try:
+            for request in self._iter_decode(content):
+                if self.max_batch_length is not None and count == self.max_batch_length:
+                    yield self._refusal('Batches are limited to %d requests.' % self.max_batch_length)
+                    return
+                count += 1
+                yield self._invocation(request)
+        except ValueError as e:
+            yield MethodInvocation(
+                value=InvalidPayloadException('JSON request cannot be parsed.', orig=e, code=-32700),
+                exception=True
+            )
+        except Exception as e:
+            yield MethodInvocation(
+                value=InvalidPayloadException(str(e), orig=e),
+                exception=True
+            )
+
+    def _refusal(self, reason):
+        return MethodInvocation(
+            value=InvalidPayloadException(reason, code=-32600),
+            exception=True
+        )
+
+    def _refuse(self, reason):
+        return RPCRequest([self._refusal(reason)])
+
+    def _iter_decode(self, raw):
+        """
+        Yields the decoded requests of a batch, or the single request.
+        """
+        if getattr(self._decode_json, '__func__', None) is not JSONRPCInterface._decode_json.__func__:
+            #A subclass decodes the whole body its own way.
+            decoded = self._decode_json(raw)
+            return decoded if isinstance(decoded, list) else [decoded]
+        #The hook only matters when something was encoded as __complex__, finding out is a lot cheaper than calling it.
+        object_hook = datetime_json_object_hook if '"__complex__"' in raw else None
+        return self.backend.iterloads(raw, object_hook)
+
     def _decode_json(self, raw):
         """
-        Override me for specialized decoding of complex JSON
+        Override me for specialized decoding of complex JSON. The body is 
+        then decoded in one go, `_iter_decode` decodes a batch a request at 
+        a time.
         """
-        return self.json.loads(raw, object_hook=datetime_json_object_hook)
+        return self.backend.loads(raw, datetime_json_object_hook)
     
-    def _encode_json(self, object):
+    def _encode_json(self, object, pretty=None, translator=None):
         """
         Override me for specialize encoding of complex json
         """
-        return self.json.dumps(object, default=datetime_json_default, indent=4)
+        pretty = self.pretty if pretty is None else pretty
+        if translator is None:
+            return self.backend.dumps(object, self.datetime_default, pretty)
+        return self.backend.dumps(object, translator_json_default(translator, self.datetime_default), pretty, 
+                                  native_decimal=False)
 
 
 
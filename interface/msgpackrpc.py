@@ -0,0 +1,99 @@
+"""
+Handler that speaks JSON RPC 2.0 envelopes over MessagePack.
+"""
+import decimal, types, calendar, datetime
+from . import BaseInterface
+from .jsonrpc import JSONRPCInterface, utc_datetime
+from ..utils import utc
+
+DECIMAL_EXT = 1 #Extension type code of Decimals, the payload is the ASCII string.
+
+
+class MessagePackRPCInterface(JSONRPCInterface):
+    """
+    Same requests and responses as `JSONRPCInterface` encoded with msgpack
+    (1.0 or later, which must be installed). Datetimes and dates travel as
+    the standard timestamp extension type (UTC), Decimals as extension
+    type `DECIMAL_EXT`. The translator turns Decimals into strings before
+    they get here unless the handler translates on encode.
+
+    Strings are written as msgpack str, bin values in requests are decoded
+    to byte strings as they are, with no base64 step. There is no JSONP,
+    pretty printing or incremental streaming. The request limits are the
+    same as `JSONRPCInterface`'s.
+    """
+    content_type = 'application/msgpack'
+    encodes_with_translator = True
+    media_types = ('application/msgpack', 'application/x-msgpack')
+
+    def __init__(self, max_body_bytes=None, max_batch_length=None, max_depth=None):
+        import msgpack
+        super(MessagePackRPCInterface, self).__init__(max_body_bytes=max_body_bytes, max_batch_length=max_batch_length,
+                                                      max_depth=max_depth)
+        self.msgpack = msgpack
+
+    def parse(self, content, method, environ, **kw):
+        rpc_request = super(MessagePackRPCInterface, self).parse(content, method, environ, **kw)
+        rpc_request.params.update(jsonp_callback=None, pretty=None)
+        return rpc_request
+
+    def response_stream(self, rpc_request, verbose_errors=False):
+        return BaseInterface.response_stream(self, rpc_request, verbose_errors)
+
+    def _encode_batch(self, encoded):
+        packer = self.msgpack.Packer()
+        return packer.pack_array_header(len(encoded)) + ''.join(encoded)
+
+    def _iter_decode(self, raw):
+        decoded = self._decode_json(raw)
+        return decoded if isinstance(decoded, list) else [decoded]
+
+    def _decode_json(self, raw):
+        #msgpack can't make datetimes on Python 2, timestamps are converted by the hooks.
+        return self.msgpack.unpackb(raw, raw=False, strict_map_key=False, ext_hook=self._ext_hook,
+                                    object_hook=self._object_hook, list_hook=self._list_hook)
+
+    def _encode_json(self, object, pretty=None, translator=None):
+        return self.msgpack.packb(object, default=self._default(translator), use_bin_type=False)
+
+    def _from_timestamp(self, value):
+        return datetime.datetime.fromtimestamp(value.seconds, utc).replace(microsecond=value.nanoseconds // 1000)
+
+    def _object_hook(self, obj):
+        Timestamp = self.msgpack.Timestamp
+        for key, value in obj.iteritems():
+            if type(value) is Timestamp:
+                obj[key] = self._from_timestamp(value)
+        return obj
+
+    def _list_hook(self, obj):
+        Timestamp = self.msgpack.Timestamp
+        for i, value in enumerate(obj):
+            if type(value) is Timestamp:
+                obj[i] = self._from_timestamp(value)
+        return obj
+
+    def _ext_hook(self, code, data):
+        if code == DECIMAL_EXT:
+            return decimal.Decimal(data)
+        return self.msgpack.ExtType(code, data)
+
+    def _default(self, translator):
+        msgpack = self.msgpack
+        def default(obj):
+            if isinstance(obj, decimal.Decimal):
+                return msgpack.ExtType(DECIMAL_EXT, str(obj))
+            try:
+                value = utc_datetime(obj)
+            except TypeError:
+                pass
+            else:
+                return msgpack.Timestamp(calendar.timegm(value.utctimetuple()), value.microsecond * 1000)
+            if isinstance(obj, types.GeneratorType):
+                return list(obj)
+            if translator is not None:
+                transformer = translator.get_transformer(obj)
+                if transformer is not None:
+                    return transformer(obj)
+            raise TypeError('%r is not MessagePack serializable' % obj)
+        return default
@@ -0,0 +1,121 @@
+"""
+Instrumentation for RequestHandler.
+
+Pass a `Metrics` instance as `RequestHandler(..., metrics=Metrics())` to
+time each phase of a request (parse, validate, method, translate, encode),
+count payload bytes, batch sizes and errors by exception class. Without
+one the handler skips all of it.
+"""
+import threading
+from bisect import bisect_left
+from .core import MethodContainer, rpc
+
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) #The last one is +Inf.
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics(object):
+    """
+    Thread safe collector. Hooks added with `add_hook` are called with
+    (phase, method name, seconds) for every timed phase, the method name
+    is None for the request wide phases (parse and encode).
+    """
+    def __init__(self, latency_buckets=LATENCY_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = {} #(phase, method) -> Histogram
+            self.batch_sizes = Histogram(BATCH_BUCKETS)
+            self.payload_bytes = {'request': Histogram(BYTE_BUCKETS), 'response': Histogram(BYTE_BUCKETS)}
+            self.errors = {} #(method, exception class name) -> count
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def observe(self, phase, method_name, seconds):
+        key = (phase, method_name or '')
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+        for hook in self.hooks:
+            hook(phase, method_name, seconds)
+
+    def observe_batch(self, size):
+        with self._lock:
+            self.batch_sizes.observe(size)
+
+    def observe_bytes(self, direction, size):
+        with self._lock:
+            self.payload_bytes[direction].observe(size)
+
+    def count_error(self, method_name, error):
+        orig = getattr(error, 'orig', None)
+        key = (method_name or '', type(orig if orig is not None else error).__name__)
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def prometheus(self):
+        """
+        Returns everything in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            lines.append('# TYPE easyrpc_phase_seconds histogram')
+            for (phase, method), histogram in sorted(self.latency.items()):
+                self._histogram(lines, 'easyrpc_phase_seconds', histogram, phase=phase, method=method)
+
+            lines.append('# TYPE easyrpc_batch_size histogram')
+            self._histogram(lines, 'easyrpc_batch_size', self.batch_sizes)
+
+            lines.append('# TYPE easyrpc_payload_bytes histogram')
+            for direction, histogram in sorted(self.payload_bytes.items()):
+                self._histogram(lines, 'easyrpc_payload_bytes', histogram, direction=direction)
+
+            lines.append('# TYPE easyrpc_errors_total counter')
+            for (method, exception), count in sorted(self.errors.items()):
+                lines.append('easyrpc_errors_total%s %d' % (self._labels(method=method, exception=exception), count))
+        return '\n'.join(lines) + '\n'
+
+    def _histogram(self, lines, name, histogram, **labels):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append('%s_bucket%s %d' % (name, self._labels(le=bound, **labels), cumulative))
+        lines.append('%s_sum%s %r' % (name, self._labels(**labels), float(histogram.sum)))
+        lines.append('%s_count%s %d' % (name, self._labels(**labels), histogram.count))
+
+    def _labels(self, **labels):
+        if not labels:
+            return ''
+        escape = lambda v: unicode(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{%s}' % ','.join([ '%s="%s"' % (k, escape(v)) for k, v in sorted(labels.items()) ])
+
+
+def metrics_service(metrics, name='Metrics'):
+    """
+    Returns a service class exposing `metrics` as the RPC method
+    `<name>.prometheus`, add it to the handler's services.
+    """
+    def prometheus(self):
+        return metrics.prometheus()
+    return type(name, (MethodContainer,), {'prometheus': rpc(_returns='String')(prometheus)})
@@ -0,0 +1,101 @@
+"""
+Sampling profiler and slow call log for RPC methods.
+
+Pass a `Profiler` as `RequestHandler(..., profiler=Profiler('/var/tmp/rpc-profiles'))`.
+A fraction of the calls to each method run under cProfile, their stats are
+aggregated per method and written to `<directory>/<method>.pstats`.
+"""
+import os, re, time, random, threading, cProfile, pstats, json
+from .utils import canonical_key
+
+
+class Profiler(object):
+    """
+    Parameters::
+     - `directory`: Where the pstats files and the slow call log go.
+     - `sample_rate`: Fraction of calls profiled, `rates` overrides it per invocation name.
+     - `slow_threshold`: Seconds after which a call is logged to `slow.log` with
+       its validated parameters. Profiled slow calls also get their own pstats
+       file; when a slow call wasn't sampled the next call to that method is
+       profiled in full instead.
+     - `flush_every`: Aggregated stats are written after this many samples of a method.
+    """
+    def __init__(self, directory, sample_rate=0.01, rates=None, slow_threshold=None, flush_every=10):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.rates = rates or {}
+        self.slow_threshold = slow_threshold
+        self.flush_every = flush_every
+        self._stats = {} #method name -> (pstats.Stats, samples since the last flush)
+        self._armed = set()
+        self._lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def should_profile(self, method_name):
+        if method_name in self._armed:
+            with self._lock:
+                if method_name in self._armed:
+                    self._armed.discard(method_name)
+                    return True
+        return random.random() < self.rates.get(method_name, self.sample_rate)
+
+    def call(self, method_name, parameters, function, *args):
+        """
+        Call `function(*args, **parameters)`, profiling it if it's sampled.
+        """
+        if self.should_profile(method_name):
+            profile = cProfile.Profile()
+            started = time.time()
+            try:
+                return profile.runcall(function, *args, **parameters)
+            finally:
+                self.record(method_name, parameters, profile, time.time() - started)
+
+        started = time.time()
+        try:
+            return function(*args, **parameters)
+        finally:
+            elapsed = time.time() - started
+            if self.slow_threshold is not None and elapsed > self.slow_threshold:
+                self.log_slow(method_name, parameters, elapsed, None)
+                with self._lock:
+                    self._armed.add(method_name)
+
+    def record(self, method_name, parameters, profile, elapsed):
+        profile_path = None
+        if self.slow_threshold is not None and elapsed > self.slow_threshold:
+            profile_path = self.path('%s-%d' % (method_name, time.time() * 1000))
+            profile.dump_stats(profile_path)
+            self.log_slow(method_name, parameters, elapsed, profile_path)
+
+        with self._lock:
+            stats, samples = self._stats.get(method_name, (None, 0))
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            samples += 1
+            if samples >= self.flush_every:
+                stats.dump_stats(self.path(method_name))
+                samples = 0
+            self._stats[method_name] = (stats, samples)
+
+    def log_slow(self, method_name, parameters, elapsed, profile_path):
+        entry = json.dumps({'method': method_name, 'seconds': elapsed, 'time': time.time(),
+                            'parameters': json.loads(canonical_key(parameters)), 'profile': profile_path})
+        with self._lock:
+            with open(os.path.join(self.directory, 'slow.log'), 'a') as log:
+                log.write(entry + '\n')
+
+    def flush(self):
+        """
+        Write the aggregated stats of every method now.
+        """
+        with self._lock:
+            for method_name, (stats, _) in self._stats.items():
+                stats.dump_stats(self.path(method_name))
+                self._stats[method_name] = (stats, 0)
+
+    def path(self, name):
+        return os.path.join(self.directory, '%s.pstats' % re.sub(r'[^\w.-]', '_', name))
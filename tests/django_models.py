@@ -0,0 +1,56 @@
+"""
+Models for the Django tests, on an in-memory sqlite database.
+"""
+import os, tempfile
+from django.conf import settings
+if not settings.configured:
+    #sqlite never closes :memory: connections, `files` is for tests that need them closed.
+    settings.configure(DATABASES={
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        'files': {'ENGINE': 'django.db.backends.sqlite3', 
+                  'NAME': os.path.join(tempfile.gettempdir(), 'easyrpc_tests.sqlite3')},
+    })
+from django.core.management.color import no_style
+from django.db import connection, models
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=20)
+    class Meta:
+        app_label = 'easyrpc_tests'
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=20)
+    class Meta:
+        app_label = 'easyrpc_tests'
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=20)
+    rank = models.FloatField(default=0)
+    author = models.ForeignKey(Author)
+    tags = models.ManyToManyField(Tag)
+    class Meta:
+        app_label = 'easyrpc_tests'
+
+
+_created = []
+
+def create_tables():
+    """
+    Creates the tables and rows once: authors a and b, tags x and y, and 
+    books b0 to b4 by a tagged with both.
+    """
+    if _created:
+        return
+    cursor, seen = connection.cursor(), set()
+    for model in (Tag, Author, Book, Book.tags.through):
+        for sql in connection.creation.sql_create_model(model, no_style(), seen)[0]:
+            cursor.execute(sql)
+    x, y = Tag.objects.create(name='x'), Tag.objects.create(name='y')
+    author = Author.objects.create(name='a')
+    Author.objects.create(name='b')
+    for i in range(5):
+        Book.objects.create(title='b%d' % i, author=author, rank=i / 3.0).tags.add(x, y)
+    _created.append(True)
@@ -0,0 +1,72 @@
+import unittest, json
+from ..core import RequestHandler, MethodContainer, rpc
+from ..interface.jsonrpc import JSONRPCInterface, JSONBackend
+from ..validation.types import Integer
+
+events = []
+
+
+class Numbers(MethodContainer):
+    @rpc(Integer)
+    def echo(self, number):
+        events.append(('call', number))
+        return number
+
+
+class LoggingDecoder(json.JSONDecoder):
+    def raw_decode(self, s, idx=0):
+        item, end = super(LoggingDecoder, self).raw_decode(s, idx)
+        events.append(('decode', item.get('id')))
+        return item, end
+
+
+class LoggingJSON(object):
+    JSONDecoder = LoggingDecoder
+    loads, dumps = staticmethod(json.loads), staticmethod(json.dumps)
+
+
+def call(number, id=None):
+    return {'jsonrpc': '2.0', 'id': number if id is None else id, 'method': 'Numbers.echo', 'params': [number]}
+
+
+class LazyBatchTest(unittest.TestCase):
+    def setUp(self):
+        del events[:]
+
+    def handle(self, body, **kw):
+        handler = RequestHandler([Numbers], interface=JSONRPCInterface(JSONBackend(LoggingJSON)), **kw)
+        return json.loads(handler.handle_request(body, 'POST', {'QUERY_STRING': ''}))
+
+    def test_runs_while_decoding(self):
+        response = self.handle(json.dumps([call(1), call(2), call(3)]))
+        self.assertEqual([r['result'] for r in response], [1, 2, 3])
+        self.assertEqual(events, [('decode', 1), ('call', 1), ('decode', 2), ('call', 2), ('decode', 3), ('call', 3)])
+
+    def test_malformed_tail(self):
+        response = self.handle(json.dumps([call(1), call(2)])[:-1] + ', {')
+        self.assertEqual([r.get('result') for r in response[:2]], [1, 2])
+        self.assertEqual(response[2]['error']['code'], -32700)
+
+    def test_batch_length(self):
+        handler = RequestHandler([Numbers], interface=JSONRPCInterface(max_batch_length=2))
+        response = json.loads(handler.handle_request(json.dumps([call(1), call(2), call(3)]), 'POST', {'QUERY_STRING': ''}))
+        self.assertEqual([r.get('result') for r in response[:2]], [1, 2])
+        self.assertEqual(response[2]['error']['code'], -32600)
+        self.assertEqual(events, [('call', 1), ('call', 2)])
+
+    def test_duplicates(self):
+        response = self.handle(json.dumps([call(1), call(1, id=2), call(3), call(3, id=4)]))
+        self.assertEqual([(r['id'], r['result']) for r in response], [(1, 1), (2, 1), (3, 3), (4, 3)])
+        self.assertEqual([e for e in events if e[0] == 'call'], [('call', 1), ('call', 3)])
+
+    def test_pool(self):
+        response = self.handle(json.dumps([call(i) for i in range(20)]), concurrency=4)
+        self.assertEqual([r['result'] for r in response], range(20))
+
+
+class EmptyBatchTest(unittest.TestCase):
+    def test_trailing_whitespace(self):
+        for body in ('[]', '[]\n', ' [ ] \r\n'):
+            self.assertEqual(list(JSONBackend(json).iterloads(body, None)), [])
+        self.assertRaises(ValueError, list, JSONBackend(json).iterloads('[] x', None))
+        self.assertEqual(RequestHandler([Numbers]).handle_request('[]\n', 'POST', {'QUERY_STRING': ''}), '[]')
@@ -0,0 +1,34 @@
+"""
+    python -m unittest easyrpc.tests.test_django_handler
+"""
+import unittest, json
+from . import django_models #Configures the settings.
+from django.test.client import RequestFactory
+from ..core import rpc
+from ..validation.types import String
+from ..interface.jsonrpc import JSONRPCInterface
+from ..django_integration import DjangoRequestHandler, DjangoContainer
+
+
+class Echo(DjangoContainer):
+    @rpc(String(required=False))
+    def text(self, text=None):
+        return text
+
+
+class BodyLimitTest(unittest.TestCase):
+    def request(self, text):
+        body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'Echo.text', 'params': [text]})
+        return RequestFactory().post('/', body, content_type='application/json'), body
+
+    def test_over_the_limit_is_not_read(self):
+        handler = DjangoRequestHandler([Echo], interface=JSONRPCInterface(max_body_bytes=100))
+        request, body = self.request(u'x' * 10000)
+        response = json.loads(handler(request).content)
+        self.assertEqual(response['error']['code'], -32600)
+        self.assertEqual(request._stream.remaining, len(body) - 101)
+
+    def test_under_the_limit(self):
+        handler = DjangoRequestHandler([Echo], interface=JSONRPCInterface(max_body_bytes=100))
+        request, body = self.request(u'x')
+        self.assertEqual(json.loads(handler(request).content)['result'], u'x')
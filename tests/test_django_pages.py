@@ -0,0 +1,49 @@
+"""
+    python -m unittest easyrpc.tests.test_django_pages
+"""
+import unittest, json
+from .django_models import Book, create_tables
+from ..core import rpc
+from ..validation.types import String, List
+from ..django_integration import DjangoRequestHandler, DjangoContainer, DjangoTranslator
+
+
+class Books(DjangoContainer):
+    @rpc(String(required=False), List(String()))
+    def page(self, cursor=None, order_by=('pk',)):
+        return self._page_models(Book, cursor=cursor, page_size=2, order_by=order_by)
+
+
+class CursorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+
+    def setUp(self):
+        Book.typemapper = {Book: {'fields': ('title', 'rank')}}
+        self.handler = DjangoRequestHandler([Books], translator=DjangoTranslator)
+
+    def tearDown(self):
+        del Book.typemapper
+
+    def call(self, cursor, order_by):
+        body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'Books.page', 'params': [cursor, order_by]})
+        return json.loads(self.handler.handle_request(body, 'POST', {'QUERY_STRING': ''}))
+
+    def titles(self, order_by):
+        titles, cursor = [], None
+        while True:
+            result = self.call(cursor, order_by)['result']
+            titles.extend([ item['title'] for item in result['items'] ])
+            cursor = result['next_cursor']
+            if cursor is None:
+                return titles
+
+    def test_float_values(self):
+        #Ranks are thirds, they don't survive being cut to 12 digits.
+        self.assertEqual(self.titles(['rank']), ['b0', 'b1', 'b2', 'b3', 'b4'])
+        self.assertEqual(self.titles(['-rank']), ['b4', 'b3', 'b2', 'b1', 'b0'])
+
+    def test_direction_is_signed(self):
+        cursor = self.call(None, ['rank'])['result']['next_cursor']
+        self.assertEqual(self.call(cursor, ['-rank'])['error']['reason'], 'The cursor belongs to a different ordering.')
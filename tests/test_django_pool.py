@@ -0,0 +1,36 @@
+"""
+    python -m unittest easyrpc.tests.test_django_pool
+"""
+import unittest, json, threading
+from . import django_models #Configures the settings.
+from django.db import connections
+from ..core import rpc
+from ..django_integration import DjangoRequestHandler, DjangoContainer
+
+OPENED = [] #(thread, connection wrapper) of every call.
+
+
+class Connects(DjangoContainer):
+    @rpc()
+    def connect(self):
+        connection = connections['files']
+        connection.cursor().execute('SELECT 1')
+        OPENED.append((threading.current_thread(), connection))
+        return True
+
+
+class PoolConnectionsTest(unittest.TestCase):
+    def test_pool_threads_close_connections(self):
+        del OPENED[:]
+        handler = DjangoRequestHandler([Connects], concurrency=4, deduplicate=False)
+        body = json.dumps([ {'jsonrpc': '2.0', 'id': i, 'method': 'Connects.connect', 'params': []} for i in range(8) ])
+        self.assertEqual([ r['result'] for r in json.loads(handler.handle_request(body, 'POST', {'QUERY_STRING': ''})) ], 
+                         [True] * 8)
+        self.assertEqual(len(OPENED), 8)
+        for thread, wrapper in OPENED:
+            self.assertNotEqual(thread, threading.current_thread())
+            self.assertEqual(wrapper.connection, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+    python -m unittest easyrpc.tests.test_django_queries
+"""
+import unittest, json
+from .django_models import Book, create_tables
+from django.conf import settings
+from django.db import connection
+from ..core import rpc
+from ..django_integration import DjangoTranslator, DjangoRequestHandler, DjangoContainer
+
+
+class Books(DjangoContainer):
+    @rpc()
+    def titles(self):
+        return [ book.title for book in Book.objects.all() ]
+
+
+class ColumnRestrictionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+
+    def setUp(self):
+        Book.typemapper = {Book: {'fields': ('id', 'title')}}
+        self.translator = DjangoTranslator()
+
+    def tearDown(self):
+        del Book.typemapper
+
+    def test_pk_in_fields_restricts_columns(self):
+        self.assertEqual(set(self.translator.get_plan(Book, ('id', 'title')).only), set(['id', 'title']))
+        self.assertEqual(set(self.translator.get_plan(Book, ('pk', 'title')).only), set(['id', 'title']))
+
+    def test_unknown_attribute_reads_every_column(self):
+        self.assertEqual(self.translator.get_plan(Book, ('id', 'missing')).only, None)
+
+    def test_existing_select_related(self):
+        for queryset in (Book.objects.select_related('author'), Book.objects.select_related()):
+            rows = self.translator.resolve(queryset.order_by('pk'))
+            self.assertEqual(rows[0], {'id': 1, 'title': 'b0'})
+
+
+class CountQueriesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+
+    def call(self, handler):
+        body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'Books.titles', 'params': []})
+        return json.loads(handler.handle_request(body, 'POST', {'QUERY_STRING': ''}))
+
+    def test_queries_are_not_kept(self):
+        handler = DjangoRequestHandler([Books], count_queries=True, max_queries=1)
+        before = len(connection.queries)
+        self.assertEqual(len(self.call(handler)['result']), 5)
+        self.assertEqual(len(connection.queries), before)
+
+    def test_debug_keeps_queries(self):
+        handler = DjangoRequestHandler([Books], count_queries=True)
+        settings.DEBUG = True
+        try:
+            before = len(connection.queries)
+            self.call(handler)
+            self.assertEqual(len(connection.queries), before + 1)
+        finally:
+            settings.DEBUG = False
+
+
+if __name__ == '__main__':
+    unittest.main()
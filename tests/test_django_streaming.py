@@ -0,0 +1,55 @@
+"""
+Streaming querysets with relations against a real (in-memory sqlite) database.
+
+    python -m unittest easyrpc.tests.test_django_streaming
+"""
+import unittest
+from .django_models import Book, create_tables
+from django.conf import settings
+from django.db import connection
+from ..django_integration import StreamingDjangoTranslator, DjangoRequestHandler
+
+
+class StreamingRelationsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        create_tables()
+
+    def tearDown(self):
+        del Book.typemapper
+
+    def setUp(self):
+        Book.typemapper = {Book: {'fields': ('id', 'title', 'tags')}}
+        self.translator = StreamingDjangoTranslator()
+        self.translator.stream_chunk_size = 2
+
+    def test_m2m(self):
+        rows = list(self.translator.resolve(Book.objects.order_by('pk')))
+        self.assertEqual(len(rows), 5)
+        for row in rows:
+            self.assertEqual(sorted([ tag['name'] for tag in row['tags'] ]), ['x', 'y'])
+
+    def test_several_lookups(self):
+        rows = list(self.translator.resolve(Book.objects.order_by('pk').prefetch_related('author__book_set')))
+        self.assertEqual([ row['title'] for row in rows ], ['b0', 'b1', 'b2', 'b3', 'b4'])
+        self.assertEqual(len(rows[-1]['tags']), 2)
+
+    def test_prefetched_per_chunk(self):
+        count = len(connection.queries)
+        settings.DEBUG = True
+        try:
+            list(self.translator.resolve(Book.objects.all()))
+        finally:
+            settings.DEBUG = False
+        #The rows, then the tags of each of the 3 chunks.
+        self.assertEqual(len(connection.queries) - count, 4)
+
+
+class StreamingHandlerTest(unittest.TestCase):
+    def test_needs_stream(self):
+        self.assertRaises(ValueError, DjangoRequestHandler, [], translator=StreamingDjangoTranslator)
+        DjangoRequestHandler([], translator=StreamingDjangoTranslator, stream=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+from ..interface.msgpackrpc import MessagePackRPCInterface
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class LimitsTest(unittest.TestCase):
+    def parse(self, interface, request):
+        return interface.parse(msgpack.packb(request), 'POST', {'QUERY_STRING': ''})
+
+    def test_limits(self):
+        interface = MessagePackRPCInterface(max_batch_length=2, max_depth=3)
+        batch = [ {'jsonrpc': '2.0', 'id': i, 'method': 'A.b', 'params': []} for i in range(3) ]
+        invocations = self.parse(interface, batch).invocations
+        self.assertEqual(len(invocations), 3)
+        self.assertEqual(invocations[-1].value.reason, 'Batches are limited to 2 requests.')
+        nested = {'jsonrpc': '2.0', 'id': 1, 'method': 'A.b', 'params': [[[[1]]]]}
+        self.assertEqual(self.parse(interface, nested).invocations[0].value.reason, 'Requests are limited to 3 levels of nesting.')
+
+    def test_defaults(self):
+        interface = MessagePackRPCInterface()
+        self.assertEqual(interface.max_batch_length, None)
+        self.assertFalse(interface.pretty)
+        self.assertTrue(interface.json is not None)
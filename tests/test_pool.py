@@ -0,0 +1,98 @@
+import unittest, json, threading, time
+from ..core import RequestHandler, MethodContainer, rpc
+from ..exceptions import InvocationTimeout, InvocationNotStarted
+from ..interface import MethodInvocation
+from ..validation.types import Integer, Float
+
+lock = threading.Lock()
+active = [0, 0] #Running now, most at once.
+serial_calls = [] #(thread, calls that had finished before it) of every `serial` call.
+finished = [] #Numbers of `nap` calls that returned.
+unstuck = [] #Numbers of `stuck` calls that returned.
+released = threading.Event()
+
+
+class Naps(MethodContainer):
+    @rpc(Integer, Float)
+    def nap(self, number, seconds):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(seconds)
+        with lock:
+            active[0] -= 1
+            finished.append(number)
+        return number
+
+    @rpc(Integer, _concurrent=False)
+    def serial(self, number):
+        with lock:
+            serial_calls.append((threading.current_thread(), len(finished)))
+        return number
+
+    @rpc(Integer, _timeout=0.05)
+    def stuck(self, number):
+        released.wait(5)
+        with lock:
+            unstuck.append(number)
+        return number
+
+
+def call(id, method, *params):
+    return {'jsonrpc': '2.0', 'id': id, 'method': 'Naps.' + method, 'params': list(params)}
+
+
+class PooledBatchTest(unittest.TestCase):
+    def setUp(self):
+        active[:] = [0, 0]
+        del serial_calls[:], finished[:], unstuck[:]
+        released.clear()
+
+    def tearDown(self):
+        released.set()
+
+    def handle(self, handler, batch):
+        return json.loads(handler.handle_request(json.dumps(batch), 'POST', {'QUERY_STRING': ''}))
+
+    def test_request_order(self):
+        #Later calls finish first, the response is still in request order.
+        handler = RequestHandler([Naps], concurrency=4, deduplicate=False)
+        response = self.handle(handler, [ call(i, 'nap', i, 0.04 - i * 0.01) for i in range(4) ])
+        self.assertEqual([ (r['id'], r['result']) for r in response ], [(i, i) for i in range(4)])
+        self.assertTrue(active[1] > 1)
+
+    def test_batch_concurrency(self):
+        handler = RequestHandler([Naps], concurrency=8, batch_concurrency=2, deduplicate=False)
+        response = self.handle(handler, [ call(i, 'nap', i, 0.02) for i in range(6) ])
+        self.assertEqual([ r['result'] for r in response ], range(6))
+        self.assertEqual(active[1], 2)
+
+    def test_not_concurrent(self):
+        #Runs on the request thread once the pooled calls are done.
+        handler = RequestHandler([Naps], concurrency=4)
+        response = self.handle(handler, [call(0, 'serial', 0), call(1, 'nap', 1, 0.02), call(2, 'nap', 2, 0.02)])
+        self.assertEqual([ r['result'] for r in response ], [0, 1, 2])
+        self.assertEqual(serial_calls, [(threading.current_thread(), 2)])
+
+    def test_timeout_and_not_started(self):
+        #One thread: the first call runs past its timeout, the second never gets the thread.
+        handler = RequestHandler([Naps], concurrency=1)
+        invocations = [ MethodInvocation('Naps.stuck', [i], i) for i in range(2) ]
+        handler.run_concurrently(invocations)
+        self.assertTrue(isinstance(invocations[0].value, InvocationTimeout))
+        self.assertTrue(isinstance(invocations[1].value, InvocationNotStarted))
+
+    def test_late_result_is_dropped(self):
+        handler = RequestHandler([Naps], concurrency=2)
+        invocation = MethodInvocation('Naps.stuck', [7], 1)
+        handler.run_concurrently([invocation])
+        self.assertTrue(isinstance(invocation.value, InvocationTimeout))
+        released.set()
+        for i in range(100):
+            if unstuck:
+                break
+            time.sleep(0.01)
+        time.sleep(0.01) #The result is copied back, or not, right after the method returns.
+        self.assertEqual(unstuck, [7])
+        self.assertTrue(invocation.is_error)
+        self.assertTrue(isinstance(invocation.value, InvocationTimeout))
@@ -0,0 +1,57 @@
+import unittest, decimal
+from ..translation.plain import PlainTranslator
+
+
+class LazyProxy(object):
+    """
+    Stands in for the object it wraps the way Django's SimpleLazyObject 
+    does, `__class__` included.
+    """
+    def __init__(self, wrapped):
+        self.__dict__['_wrapped'] = wrapped
+
+    @property
+    def __class__(self):
+        return self._wrapped.__class__
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def __str__(self):
+        return str(self._wrapped)
+
+    def __iter__(self):
+        return iter(self._wrapped)
+
+
+class LazyProxyTest(unittest.TestCase):
+    def setUp(self):
+        self.translator = PlainTranslator()
+
+    def test_decimal(self):
+        self.assertEqual(self.translator.resolve(LazyProxy(decimal.Decimal('1.50'))), '1.50')
+
+    def test_dict(self):
+        self.assertEqual(self.translator.resolve(LazyProxy({'a': decimal.Decimal('2')})), {'a': '2'})
+
+    def test_proxies_of_different_types(self):
+        #Both share type(), the dispatch mustn't be cached for it.
+        self.assertEqual(self.translator.resolve([LazyProxy([1]), LazyProxy(decimal.Decimal('3'))]), [[1], '3'])
+
+
+class ColumnarTest(unittest.TestCase):
+    def setUp(self):
+        self.translator = PlainTranslator()
+
+    def test_rows(self):
+        rows = [{'a': 1, 'b': 2}, {'a': 3, 'b': 4}]
+        table = self.translator.resolve_columnar(rows)
+        self.assertEqual([ dict(zip(table['columns'], row)) for row in table['rows'] ], rows)
+
+    def test_left_alone(self):
+        for value in ([], [1, 2], [{'a': 1}, {'b': 2}], {'a': 1}):
+            self.assertEqual(self.translator.resolve_columnar(value), value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from ..exceptions import InvalidParameters
+from ..validation.types import BaseType, NoValue, String, Integer, List, Dict, compile_parameters, missing_value
+
+
+class Email(String):
+    def validate(self, keyword, value=NoValue):
+        value = super(Email, self).validate(keyword, value)
+        if value is not None and '@' not in value:
+            raise InvalidParameters('Argument "%s" must be an email address.' % keyword)
+        return value
+
+
+class Even(object):
+    """Doesn't subclass BaseType, only has `validate`."""
+    def validate(self, keyword, value=NoValue):
+        if value is NoValue or value % 2:
+            raise InvalidParameters('Argument "%s" must be even.' % keyword)
+        return value
+
+
+class Argspec(object):
+    def __init__(self, *args):
+        self.args = list(args)
+
+
+class OverriddenValidateTest(unittest.TestCase):
+    def test_parameter(self):
+        validate = compile_parameters(Argspec('self', 'to'), [Email()])
+        self.assertEqual(validate({'to': u'a@b.c'}), {'to': u'a@b.c'})
+        self.assertRaises(InvalidParameters, validate, {'to': u'nobody'})
+
+    def test_nested(self):
+        self.assertRaises(InvalidParameters, List(Email()).compile(), 'to', [u'a@b.c', u'nobody'])
+        self.assertRaises(InvalidParameters, Dict({'to': Email()}).compile(), 'message', {'to': u'nobody'})
+        self.assertRaises(InvalidParameters, List(Even()).compile(), 'numbers', [2, 3])
+
+    def test_missing(self):
+        self.assertRaises(InvalidParameters, missing_value, Email(required=False, default=u'nobody'), 'to')
+        self.assertEqual(missing_value(Email(required=False, default=u'a@b.c'), 'to'), u'a@b.c')
+        self.assertRaises(InvalidParameters, missing_value, Even(), 'number')
+
+    def test_compiled(self):
+        check = List(Integer(coerce=True)).compile()
+        self.assertEqual(check('numbers', [1, '2']), [1, 2])
+        self.assertRaises(InvalidParameters, check, 'numbers', [1, 'x'])
@@ -5,6 +5,7 @@ THIS SHOULD BE PART OF THE JSON ENCODER or INTERFACE REALLY.
 Translate types to serializable objects.
 """
 import inspect, itertools, decimal, types
+from operator import itemgetter
 from datetime import datetime, date
 from ..exceptions import NoTransformer
 
@@ -12,14 +13,27 @@ class PlainTranslator(object):
     """
     This transformer turns all objects into the most basic 
     representation we know how.
+
+    Each instance owns its registry, it is built in the constructor and 
+    is frozen afterwards. Use `extend` to derive a translator with more types.
     """
-    DEFAULT_TRANSFORMERS = list()
-    TRANSFORMERS = list()
-    
     def __init__(self, additional_types=()):
-        for predicate, func in additional_types:
+        self._frozen = False
+        self._dispatch = {} #type -> (instance predicates to try first, type callback)
+        self.default_transformers = ()
+        self.transformers = ()
+        self.additional_types = tuple(additional_types)
+        for predicate, func in self.additional_types:
             self.add_type(predicate, func)
         self.add_defaults()
+        self._frozen = True
+
+    def extend(self, additional_types=()):
+        """
+        Returns a new translator of the same class with this translator's 
+        additional types followed by `additional_types`.
+        """
+        return self.__class__(self.additional_types + tuple(additional_types))
 
     def add_defaults(self):
         """
@@ -52,16 +66,47 @@ class PlainTranslator(object):
          - `predicate`: Can be a callable with a single argument that returns true or false OR a type.
          - `func`: Is a callable that accepts a single argument which returns a plain value, sequence or dictionary.
         """
-        storage = self.TRANSFORMERS if default is False else self.DEFAULT_TRANSFORMERS
-        storage.append(
-            (predicate if inspect.isfunction(predicate) else lambda x: isinstance(x, predicate), func)
-        )
-    
+        if self._frozen:
+            raise TypeError('Translator registries cannot change after construction, use extend().')
+        if default is False:
+            self.transformers += ((predicate, func),)
+        else:
+            self.default_transformers += ((predicate, func),)
+        self._dispatch.clear()
+
+    def compile_dispatch(self, cls):
+        """
+        Build the dispatch entry for a type. Type predicates are checked 
+        against the class (and so its MRO) once, callable predicates can 
+        depend on the instance so any that come before the first type match 
+        are kept and tried per object.
+        """
+        predicates = []
+        for predicate, callback in itertools.chain(self.default_transformers, self.transformers):
+            if inspect.isfunction(predicate):
+                predicates.append((predicate, callback))
+            elif issubclass(cls, predicate):
+                return tuple(predicates), callback
+        return tuple(predicates), NoTransformer
+
     def get_transformer(self, obj):
-        for predicate, callback in itertools.chain(self.DEFAULT_TRANSFORMERS, self.TRANSFORMERS):
+        cls = type(obj)
+        try:
+            predicates, callback = self._dispatch[cls]
+        except KeyError:
+            if cls is types.InstanceType or obj.__class__ is not cls:
+                #Old style classes all share a type and proxies (ie. SimpleLazyObject) pose as 
+                #what they wrap, those go by __class__ and aren't cached.
+                predicates, callback = self.compile_dispatch(obj.__class__)
+            else:
+                predicates, callback = self._dispatch[cls] = self.compile_dispatch(cls)
+
+        for predicate, pcallback in predicates:
             if predicate(obj) is True:
-                return callback
-        raise NoTransformer('No transformer could be found for %s' % str(type(obj)))
+                return pcallback
+        if callback is NoTransformer:
+            raise NoTransformer('No transformer could be found for %s' % str(type(obj)))
+        return callback
 
     def resolve(self, obj):
         trans = self.get_transformer(obj)
@@ -69,6 +114,31 @@ class PlainTranslator(object):
             return trans(obj)
         return obj
 
+    def resolve_columnar(self, obj):
+        """
+        Like `resolve`, but a list of dicts that all have the same keys comes 
+        back as {'columns': [...], 'rows': [[...], ...]}. Other lists, empty 
+        ones included, are left as they are.
+        """
+        return self.tabulate(self.resolve(obj))
+
+    def tabulate(self, obj):
+        if not isinstance(obj, list) or not obj:
+            return obj
+        first = obj[0]
+        if not isinstance(first, dict):
+            return obj
+        keys = first.viewkeys()
+        for row in obj:
+            if not isinstance(row, dict) or row.viewkeys() != keys:
+                return obj
+        columns = first.keys()
+        if len(columns) == 1:
+            column = columns[0]
+            return {'columns': columns, 'rows': [ [row[column]] for row in obj ]}
+        get = itemgetter(*columns)
+        return {'columns': columns, 'rows': [ list(get(row)) for row in obj ]}
+
 
 
 
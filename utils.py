@@ -1,4 +1,4 @@
-import time
+import time, json
 from datetime import tzinfo, timedelta
 
 ZERO = timedelta(0)
@@ -41,23 +41,68 @@ class LocalTimezone(tzinfo):
         return time.tzname[self._isdst(dt)]
 
     def _isdst(self, dt):
-        tt = (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.weekday(), 0, -1)
-        try:
-            stamp = time.mktime(tt)
-        except (OverflowError, ValueError):
-            # 32 bit systems can't handle dates after Jan 2038, and certain
-            # systems can't handle dates before ~1901-12-01:
-            #
-            # >>> time.mktime((1900, 1, 13, 0, 0, 0, 0, 0, 0))
-            # OverflowError: mktime argument out of range
-            # >>> time.mktime((1850, 1, 13, 0, 0, 0, 0, 0, 0))
-            # ValueError: year out of range
-            #
-            # In this case, we fake the date, because we only care about the
-            # DST flag.
-            tt = (2037,) + tt[1:]
-            stamp = time.mktime(tt)
-        tt = time.localtime(stamp)
-        return tt.tm_isdst > 0
-
-    
\ No newline at end of file
+        return _isdst(dt)
+
+
+def _isdst(dt):
+    tt = (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.weekday(), 0, -1)
+    try:
+        stamp = time.mktime(tt)
+    except (OverflowError, ValueError):
+        # 32 bit systems can't handle dates after Jan 2038, and certain
+        # systems can't handle dates before ~1901-12-01:
+        #
+        # >>> time.mktime((1900, 1, 13, 0, 0, 0, 0, 0, 0))
+        # OverflowError: mktime argument out of range
+        # >>> time.mktime((1850, 1, 13, 0, 0, 0, 0, 0, 0))
+        # ValueError: year out of range
+        #
+        # In this case, we fake the date, because we only care about the
+        # DST flag.
+        tt = (2037,) + tt[1:]
+        stamp = time.mktime(tt)
+    tt = time.localtime(stamp)
+    return tt.tm_isdst > 0
+
+
+utc = UTC()
+
+#Local UTC offset in seconds by (year, month, day, hour) of local time.
+_local_offsets = {}
+
+def local_utcoffset(dt):
+    """
+    Returns the UTC offset in seconds of a naive local datetime. DST is 
+    only looked up once per local hour, afterwards it's a dict lookup.
+    """
+    key = (dt.year, dt.month, dt.day, dt.hour)
+    try:
+        return _local_offsets[key]
+    except KeyError:
+        if len(_local_offsets) > 100000:
+            _local_offsets.clear()
+        offset = _local_offsets[key] = -time.altzone if _isdst(dt) else -time.timezone
+        return offset
+
+
+def to_utc(dt):
+    """
+    Convert a datetime to UTC, naive values are taken as local time.
+    """
+    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+        return (dt.replace(tzinfo=None) - timedelta(seconds=local_utcoffset(dt))).replace(tzinfo=utc)
+    return dt.astimezone(utc)
+
+
+MISSING = object() #Sentinel for absent values where None is a valid one.
+
+def canonical_key(obj):
+    """
+    A string that is equal for equal JSON-like values, dictionary order and 
+    str/unicode differences don't matter. Unknown types use their repr.
+    """
+    try:
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'), default=repr)
+    except UnicodeDecodeError:
+        #Binary strings (ie. msgpack bin values), latin-1 maps every byte.
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'), default=repr, encoding='latin-1')
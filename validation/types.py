@@ -8,21 +8,108 @@ from ..exceptions import InvalidParameters
 class NoValue(object): pass
 
 class BaseType(object):
+    """
+    Parameters::
+     - `required`: Missing values raise instead of using `default`.
+     - `coerce`: Convert values of the wrong type with `coerce_to` instead of failing.
+     - `min_length`/`max_length`: Bounds on `len(value)`.
+
+    `compile` turns the type into a `check(keyword, value)` function once, 
+    `validate` is the uncompiled entry point. Types that don't subclass 
+    this only need `validate`.
+    """
+    name = "Value"
     type_check = ()
+    coerce_to = None
     
-    def __init__(self, required=True, default=None):
+    def __init__(self, required=True, default=None, coerce=False, min_length=None, max_length=None):
         self.required = required
         self.default = default
+        self.coerce = coerce
+        self.min_length = min_length
+        self.max_length = max_length
+        self._check = None
     
     def validate(self, keyword, value=NoValue):
+        if self._check is None:
+            self._check = self.compile()
         if value is NoValue:
-            if self.required is True:
-                raise InvalidParameters('Argument "%s" is required.' % keyword)
-            value = self.default
+            return self.missing(keyword)
+        return self._check(keyword, value)
+
+    def missing(self, keyword):
+        if self.required is True:
+            raise InvalidParameters('Argument "%s" is required.' % keyword)
+        if self._check is None:
+            self._check = self.compile()
+        return self._check(keyword, self.default)
+
+    def compile(self):
+        """
+        Returns a `check(keyword, value)` function for values that were 
+        passed in. None is always accepted.
+        """
+        type_check, coerce_to, name = self.type_check, self.coerce_to if self.coerce else None, self.name
+        min_length, max_length = self.min_length, self.max_length
+
+        def fail(keyword, value):
+            raise InvalidParameters('Argument "%s" must be a valid %s, got %s instead.' % (keyword, name, type(value).__name__))
+
+        if not type_check and min_length is None and max_length is None:
+            return lambda keyword, value: value
+
+        if coerce_to is None and min_length is None and max_length is None:
+            def check(keyword, value):
+                if value is not None and not isinstance(value, type_check):
+                    fail(keyword, value)
+                return value
+            return check
+
+        def check(keyword, value):
+            if value is None:
+                return value
+            if type_check and not isinstance(value, type_check):
+                if coerce_to is None:
+                    fail(keyword, value)
+                try:
+                    value = coerce_to(value)
+                except (TypeError, ValueError):
+                    fail(keyword, value)
+            if min_length is not None and len(value) < min_length:
+                raise InvalidParameters('Argument "%s" must have at least %d items.' % (keyword, min_length))
+            if max_length is not None and len(value) > max_length:
+                raise InvalidParameters('Argument "%s" must have at most %d items.' % (keyword, max_length))
+            return value
+        return check
+
+
+def get_type(param):
+    """
+    Types can be given as classes or instances.
+    """
+    return param() if isinstance(param, type) else param
+
+
+def compiles(param):
+    """
+    Whether `compile` can stand in for `validate`, subclasses that override 
+    `validate` (and types that don't subclass BaseType) go through it.
+    """
+    validate = getattr(type(param), 'validate', None)
+    return getattr(validate, '__func__', None) is BaseType.validate.__func__
+
+
+def compile_type(param):
+    """
+    The `check(keyword, value)` function of a type. Types that only have 
+    `validate(keyword, value=NoValue)` are checked with it.
+    """
+    return param.compile() if compiles(param) else param.validate
+
+
+def missing_value(param, keyword):
+    return param.missing(keyword) if compiles(param) else param.validate(keyword)
 
-        if value is not None and (self.type_check and not isinstance(value, self.type_check)):
-            raise InvalidParameters('Argument "%s" must be a valid %s, got %s instead.' % (keyword, self.name, type(value).__name__))
-        return value
 
 class Any(BaseType):
     pass
@@ -30,49 +117,148 @@ class Any(BaseType):
 class String(BaseType):
     name = "String"
     type_check = (basestring,)
+    coerce_to = unicode
+
+def to_integer(value):
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError('Not a whole number.')
+    return int(value)
 
 class Integer(BaseType):
     name = "Integer"
     type_check = (int,)
+    coerce_to = staticmethod(to_integer)
 
 class Float(BaseType):
     name = "Float"
     type_check = (float,)
+    coerce_to = float
 
 class Boolean(BaseType):
     name = "Boolean"
     type_check = (bool,)
 
 class List(BaseType):
+    """
+    `items` validates every element, ie. `List(Integer())`. The list is 
+    only copied when an element is changed by coercion.
+    """
     name = "List/Sequence"
     type_check = (list,)
 
+    def __init__(self, items=None, **kw):
+        super(List, self).__init__(**kw)
+        self.items = get_type(items) if items is not None else None
+
+    def compile(self):
+        check_list = super(List, self).compile()
+        if self.items is None:
+            return check_list
+        check_item = compile_type(self.items)
+
+        def check(keyword, value):
+            value = check_list(keyword, value)
+            if value is None:
+                return value
+            copied = None
+            for index, item in enumerate(value):
+                try:
+                    cleaned = check_item(keyword, item)
+                except InvalidParameters:
+                    check_item('%s[%d]' % (keyword, index), item) #Fails again, with the full path.
+                    raise
+                if cleaned is not item:
+                    if copied is None:
+                        copied = list(value)
+                    copied[index] = cleaned
+            return value if copied is None else copied
+        return check
+
 class Dict(BaseType):
+    """
+    `schema` maps keys to types, ie. `Dict({'id': Integer(), 'name': String(required=False)})`. 
+    Missing optional keys are filled in only when they have a default. With 
+    `allow_extra=False` keys outside the schema are rejected. The dictionary 
+    is only copied when a value is changed.
+    """
     name = "Hash/Dictionary"
     type_check = (dict,)
 
+    def __init__(self, schema=None, allow_extra=True, **kw):
+        super(Dict, self).__init__(**kw)
+        self.schema = dict([ (k, get_type(v)) for k, v in schema.iteritems() ]) if schema is not None else None
+        self.allow_extra = allow_extra
 
-def validate_parameters(argspec, params, values):
+    def compile(self):
+        check_dict = super(Dict, self).compile()
+        if self.schema is None:
+            return check_dict
+        keys = tuple([ (key, param, compile_type(param)) for key, param in self.schema.iteritems() ])
+        allow_extra, schema = self.allow_extra, self.schema
+
+        def check(keyword, value):
+            value = check_dict(keyword, value)
+            if value is None:
+                return value
+            copied = None
+            for key, param, check_value in keys:
+                if key in value:
+                    item = value[key]
+                    try:
+                        cleaned = check_value(keyword, item)
+                    except InvalidParameters:
+                        check_value('%s.%s' % (keyword, key), item) #Fails again, with the full path.
+                        raise
+                else:
+                    #Raises when it's required.
+                    item, cleaned = NoValue, missing_value(param, '%s.%s' % (keyword, key))
+                    if cleaned is None:
+                        continue #Only defaults are filled in.
+                if cleaned is not item:
+                    if copied is None:
+                        copied = dict(value)
+                    copied[key] = cleaned
+            if not allow_extra:
+                extra = sorted(set(value).difference(schema))
+                if extra:
+                    raise InvalidParameters('Argument "%s" has unexpected keys: %s.' % (keyword, ', '.join(map(unicode, extra))))
+            return value if copied is None else copied
+        return check
+
+
+def compile_parameters(argspec, params):
     """
-    Take the argspec, type params and passed in values and 
-    validates them. 
-    
-    Returns a dictionary of arg -> cleaned value
+    Take the argspec and type params and return a function that 
+    validates passed in values against them.
+
+    The returned function returns a dictionary of arg -> cleaned value
     """
-    cleaned = {}
     #Validate invocations parameters against descriptor params. Skip first in argspec (self)
-    if argspec.args[0] == 'self':
+    if argspec.args and argspec.args[0] == 'self':
         args = argspec.args[1:]
     else:
         args = argspec.args
+    checks = tuple([ (arg, param, compile_type(param)) for arg, param in zip(args, params) ])
+
+    def validate(values):
+        cleaned = {}
+        for arg, param, check in checks:
+            if arg in values:
+                cleaned[arg] = check(arg, values[arg])
+            else:
+                cleaned[arg] = missing_value(param, arg)
+        return cleaned
+    return validate
+
+
+def validate_parameters(argspec, params, values):
+    """
+    Take the argspec, type params and passed in values and 
+    validates them. 
     
-    for arg, param in zip(args, params):
-        if arg in values:
-            value = param.validate(arg, values.get(arg))
-        else:
-            value = param.validate(arg)
-        cleaned[arg] = value
-    return cleaned
+    Returns a dictionary of arg -> cleaned value
+    """
+    return compile_parameters(argspec, params)(values)
 
 
 
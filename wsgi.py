@@ -0,0 +1,51 @@
+"""
+WSGI wrapper, for services that don't need Django.
+
+    application = WSGIRequestHandler([customdata])
+"""
+import urlparse
+from core import RequestHandler
+
+STATUS = '200 OK' #Errors are reported in the envelope, like DjangoRequestHandler does.
+
+
+class WSGIRequestHandler(RequestHandler):
+    """
+    Same semantics as `DjangoRequestHandler.__call__`: the body of POST
+    requests is the payload, otherwise the `payload` query parameter is,
+    and GET requests with a `callback` parameter get JSONP.
+    """
+    def __call__(self, environ, start_response):
+        method = environ.get('REQUEST_METHOD', 'GET')
+        querystring_dict = self.parse_querystring(environ.get('QUERY_STRING', ''))
+        if method == 'POST':
+            payload = self.read_body(environ, getattr(self.select_interface(environ), 'max_body_bytes', None))
+        else:
+            payload = querystring_dict.get('payload', '{}')
+
+        content = self.handle_request(payload, method=method, environ=environ, querystring_dict=querystring_dict)
+        headers = {}
+        if isinstance(content, (tuple, list)):
+            headers = content[1]
+            content = content[0]
+
+        response_headers = {'Content-Type': self.interface.content_type}
+        response_headers.update(headers)
+        if not self.stream:
+            response_headers['Content-Length'] = str(len(content))
+            content = [content]
+        start_response(STATUS, [ (k, str(v)) for k, v in response_headers.items() ])
+        return content
+
+    def parse_querystring(self, query_string):
+        #The last value wins, like QueryDict.get.
+        return dict([ (k, v[-1]) for k, v in urlparse.parse_qs(query_string).iteritems() ])
+
+    def read_body(self, environ, limit=None):
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if limit is not None:
+            length = min(length, limit + 1) #Enough for the interface to see it's over the limit.
+        return environ['wsgi.input'].read(length) if length > 0 else ''